@@ -14,12 +14,13 @@ class Ui_MainWindow(object):
         MainWindow.resize(900, 630)
         self.centralwidget = QtWidgets.QWidget(MainWindow)
         self.centralwidget.setObjectName("centralwidget")
-        self.listWidgetLog = QtWidgets.QListWidget(self.centralwidget)
-        self.listWidgetLog.setGeometry(QtCore.QRect(30, 10, 321, 451))
+        self.listViewLog = QtWidgets.QListView(self.centralwidget)
+        self.listViewLog.setGeometry(QtCore.QRect(30, 10, 321, 451))
         font = QtGui.QFont()
         font.setPointSize(10)
-        self.listWidgetLog.setFont(font)
-        self.listWidgetLog.setObjectName("listWidgetLog")
+        self.listViewLog.setFont(font)
+        self.listViewLog.setUniformItemSizes(True)
+        self.listViewLog.setObjectName("listViewLog")
         self.radioButton_1 = QtWidgets.QRadioButton(self.centralwidget)
         self.radioButton_1.setGeometry(QtCore.QRect(30, 480, 150, 21))
         font = QtGui.QFont()
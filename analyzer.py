@@ -1,9 +1,253 @@
+import itertools
+import json
+import os
 import re
-import janome.tokenizer # janome.tokenizerをインポート
+import sys
+import threading
+from collections import OrderedDict, deque
+# janome.tokenizerはシステム辞書の読み込みを含めてimportだけで約0.1秒かかる。
+# 形態素解析を使わない起動でその時間を払わないよう、
+# get_tokenizer()で初めてTokenizerを生成するときにimportする。
+
+# Tokenizerは生成時にシステム辞書を読み込むため重い。
+# スレッドごとに1個だけ作って使い回す。
+_local = threading.local()
+
+def get_tokenizer():
+    """ 現在のスレッド用のTokenizerオブジェクトを返す関数
+
+    初めて呼ばれたときにTokenizerオブジェクトを生成し、以降は同じものを返す。
+    Tokenizerはスレッド間で共有せず、スレッドごとに1個生成する。
+    janome.tokenizerは最初のTokenizerを生成するときにimportする。
+
+        Returns:
+            janome.tokenizer.Tokenizer: 形態素解析を行うTokenizerオブジェクト。
+
+    """
+    t = getattr(_local, 'tokenizer', None)
+    if t is None:
+        import janome.tokenizer # janome.tokenizerをインポート
+        t = janome.tokenizer.Tokenizer() # Tokenizerオブジェクトを生成。
+        _local.tokenizer = t
+    return t
+
+# 品詞情報の文字列（'名詞,一般,*,*'など）は種類が少ないので、
+# 小さな整数のIDに置き換えて保持する。
+_pos_ids = {}          # {品詞情報: ID}
+_pos_names = []        # IDの順に並べた品詞情報
+_keyword_pos = set()   # keyword_check()の条件を満たす品詞のID
+_pos_lock = threading.Lock()
+# キーワードとみなす品詞の正規表現
+KEYWORD_POS = re.compile('名詞,(一般|固有名詞|サ変接続|形容動詞語幹)')
+
+def pos_id(part):
+    """ 品詞情報の文字列に対応するIDを返す関数
+
+    初めて現れた品詞情報には新しいIDを割り当て、
+    そのときに1度だけキーワードとみなす品詞かどうかを判定しておく。
+
+    Parameters:
+        part(str): 形態素解析の品詞の部分。
+
+        Returns:
+            int: 品詞のID。
+
+    """
+    id = _pos_ids.get(part)
+    if id is None:
+        with _pos_lock:
+            id = _pos_ids.get(part)
+            if id is None:
+                id = len(_pos_names)
+                _pos_names.append(part)
+                if KEYWORD_POS.match(part):
+                    _keyword_pos.add(id)
+                # IDを登録するのは最後にして、他のスレッドが
+                # 判定の済んでいないIDを見ないようにする
+                _pos_ids[part] = id
+    return id
+
+def pos_name(id):
+    """ 品詞のIDに対応する品詞情報の文字列を返す関数
+
+    Parameters:
+        id(int): pos_id()が返した品詞のID。
+
+        Returns:
+            str: 品詞情報の文字列。
+
+    """
+    return _pos_names[id]
+
+def is_keyword(id):
+    """ 品詞のIDがキーワードとみなす名詞のものか調べる関数
+
+    Parameters:
+        id(int): pos_id()が返した品詞のID。
+
+        Returns:
+            bool: キーワードとみなす名詞であればTrue。
+
+    """
+    return id in _keyword_pos
+
+class AnalysisCache(object):
+    """ 形態素解析の結果を保持するLRUキャッシュ
+
+    解析対象の文章をキーに、解析結果を変更できないタプル
+    ((形態素, 品詞のID), ...)で保持する。
+    保持できる件数を超えたら最も長く使われていない結果から捨てる。
+
+    Attributes:
+      maxsize (int): 保持する解析結果の最大件数。0ならキャッシュしない。
+      hits (int): キャッシュにあった回数。
+      misses (int): キャッシュになかった回数。
+    """
+    # 保存ファイルの形式のバージョン
+    VERSION = 1
+
+    def __init__(self, maxsize):
+        """ 空のキャッシュを作る
+
+        Parameters:
+            maxsize(int): 保持する解析結果の最大件数。
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text):
+        """ 解析結果を取り出す
+
+        Parameters:
+            text(str): 解析対象の文章。
+
+        Returns:
+            tupleのtuple: ((形態素, 品詞のID), ...)。キャッシュになければNone。
+        """
+        with self._lock:
+            tokens = self._entries.get(text)
+            if tokens is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(text)
+            return tokens
+
+    def put(self, text, tokens):
+        """ 解析結果を追加する
+
+        Parameters:
+            text(str): 解析対象の文章。
+            tokens(tupleのtuple): ((形態素, 品詞のID), ...)
+        """
+        with self._lock:
+            self._entries[text] = tokens
+            self._entries.move_to_end(text)
+            self._trim()
+
+    def resize(self, maxsize):
+        """ 最大件数を変更し、超えたぶんを捨てる
+
+        Parameters:
+            maxsize(int): 保持する解析結果の最大件数。
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self._trim()
+
+    def _trim(self):
+        """ 最大件数を超えたぶんを古い順に捨てる（ロックを取って呼ぶ） """
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last = False)
+
+    def clear(self):
+        """ 解析結果と回数をすべて消す """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """ 監視用にキャッシュの状態を返す
+
+        Returns:
+            dic: {'hits': int, 'misses': int, 'size': int, 'maxsize': int}
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def save(self, path):
+        """ 解析結果をJSONファイルに保存する
+
+        使われた順（古いものが先）に保存するので、読み込んだ後もLRUの順序が保たれる。
+        品詞のIDはプロセスごとに違うので、品詞情報の文字列にして保存する。
+
+        Parameters:
+            path(str): 保存先のパス。
+        """
+        with self._lock:
+            entries = [[text, [[surface, pos_name(id)] for surface, id in tokens]]
+                       for text, tokens in self._entries.items()]
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding = 'utf_8') as f:
+            json.dump({'version': AnalysisCache.VERSION, 'entries': entries},
+                      f, ensure_ascii = False)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """ save()で保存した解析結果を読み込む
+
+        ファイルがない、形式が違う場合は何もしない。
+
+        Parameters:
+            path(str): 保存先のパス。
+
+        Returns:
+            int: 読み込んだ件数。
+        """
+        try:
+            with open(path, 'r', encoding = 'utf_8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get('version') != AnalysisCache.VERSION:
+            return 0
+        for text, tokens in data['entries']:
+            self.put(text, tuple((surface, pos_id(part))
+                                 for surface, part in tokens))
+        return len(data['entries'])
+
+# 保持する解析結果の件数の初期値
+CACHE_SIZE = 1024
+# analyze()の結果を保持するキャッシュ。件数はcache.resize()で変更できる。
+cache = AnalysisCache(CACHE_SIZE)
+# analyze_many()が1回にプロセスに渡す文章の数の初期値
+CHUNK_SIZE = 256
+
+def warm_up(cache_path=None):
+    """ 起動時に呼び出して、最初の対話の前にTokenizerを準備しておく関数
+
+    Tokenizerを生成し、短い文章を1回解析して辞書を読み込ませる。
+    解析を行うスレッドから呼び出す。
+
+    Parameters:
+        cache_path(str): cache.save()で保存したファイル。
+                         指定すると解析結果のキャッシュを読み込む。
+
+    """
+    get_tokenizer().tokenize('こんにちは')
+    if cache_path:
+        cache.load(cache_path)
 
 def analyze(text): # -----------------------------------------①
     """ 形態素解析を行う関数
 
+    同じ文章の解析結果はcacheから返す。
+
     Parameters:
         text(str): 解析対象の文章。  
             
@@ -12,28 +256,143 @@ def analyze(text): # -----------------------------------------①
                 形態素と品詞のペアを格納した多重リスト。
   
     """    
-    t = janome.tokenizer.Tokenizer() # Tokenizerオブジェクトを生成。
-    tokens = t.tokenize(text)        # 形態素解析を実行。
+    # 呼び出し元が変更してもキャッシュに影響しないよう、リストにして返す
+    return [[surface, _pos_names[id]] for surface, id in analyze_tokens(text)]
+
+def analyze_tokens(text):
+    """ 形態素解析の結果を変更できないタプルで返す関数
+
+    analyze()と違って品詞は品詞のIDで返し、キャッシュの中身をそのまま返すので、
+    解析結果ごとにリストを作らずに済む。同じ文章の解析結果はcacheから返す。
+
+    Parameters:
+        text(str): 解析対象の文章。
+
+        Returns:
+            tupleのtuple: ((形態素, 品詞のID), ...)
+
+    """
+    tokens = cache.get(text)         # キャッシュにあればそれを使う。
+    if tokens is None:
+        tokens = tokenize(text)
+        cache.put(text, tokens)
+    return tokens
+
+def tokenize(text):
+    """ キャッシュを使わずに形態素解析を行う関数
+
+    Parameters:
+        text(str): 解析対象の文章。
+
+        Returns:
+            tupleのtuple: ((形態素, 品詞のID), ...)
+
+    """
+    t = get_tokenizer()              # 使い回しのTokenizerオブジェクトを取得。
     result = []                      # 解析結果の形態素と品詞を格納するリスト。
     
-    # リストからTokenオブジェクトを1つずつ取り出す
-    for token in tokens: # ----------------------------------②
+    # 形態素解析を実行し、Tokenオブジェクトを1つずつ取り出す
+    for token in t.tokenize(text): # ------------------------②
         result.append(               # resultに追加する。
-            [token.surface,          # 形態素を取得。
-             token.part_of_speech])  # 品詞情報を取得。
-    return(result)
+            (sys.intern(token.surface),        # 形態素を取得。
+             pos_id(token.part_of_speech)))   # 品詞情報をIDにして取得。
+    return tuple(result)
+
+def analyze_many(texts, processes=None, chunksize=CHUNK_SIZE):
+    """ 多数の文章を順に形態素解析するジェネレーター
+
+    会話ログなどの大量の文章をまとめて解析するときに使う。
+    入力は必要なぶんだけ読み進め、解析結果を入力と同じ順に1件ずつ返す。
+
+    Parameters:
+        texts(strのiterable): 解析対象の文章。
+        processes(int): 並列に解析するプロセスの数。
+                        Noneなら現在のプロセスで1件ずつ解析する。
+        chunksize(int): processesを指定したときに、
+                        1回にプロセスに渡す文章の数。
+
+        Yields:
+            strのlistを格納したlist: analyze()と同じ形式の解析結果。
+
+    """
+    if processes is None:
+        for text in texts:
+            yield analyze(text)
+        return
+    # 入力をchunksize件ずつに分けてプロセスプールに渡す。
+    # 入力全体を一度に渡すとメモリに載り切らないので、
+    # 結果を待っているチャンクがプロセス数の2倍を超えないようにする。
+    # プロセスプールを使うときだけmultiprocessingをimportする
+    import multiprocessing
+    texts = iter(texts)
+    pending = deque()
+    with multiprocessing.Pool(processes, initializer = warm_up) as pool:
+        while True:
+            while len(pending) < processes * 2:
+                chunk = list(itertools.islice(texts, chunksize))
+                if not chunk:
+                    break
+                pending.append(pool.apply_async(_analyze_chunk, (chunk,)))
+            if not pending:
+                return
+            # 先に渡したチャンクから順に結果を返す
+            for result in pending.popleft().get():
+                yield result
+
+def _analyze_chunk(texts):
+    """ analyze_many()がプロセスプールで実行する関数
+
+    Parameters:
+        texts(strのlist): 解析対象の文章。
+
+        Returns:
+            list: 文章ごとのanalyze()の結果。
+
+    """
+    return [analyze(text) for text in texts]
+
+def extract_keywords(text):
+    """ キーワードとみなす名詞だけを取り出すジェネレーター
+
+    analyze()で全形態素のリストを作ってからkeyword_check()で選ぶかわりに、
+    Tokenizerが返す形態素を1個ずつ調べて、条件を満たす名詞だけを返す。
+    キャッシュに解析結果があればそれを使うが、新しい解析結果はキャッシュしない。
+
+    Parameters:
+        text(str): 解析対象の文章。
+
+    Yields:
+        str: キーワードとみなす名詞の形態素。
+
+    """
+    tokens = cache.get(text)
+    if tokens is not None:
+        for surface, id in tokens:
+            if id in _keyword_pos:
+                yield surface
+        return
+    # Tokenizer.tokenize()はジェネレーターなので、形態素は1個ずつ届く。
+    # 同じ品詞の文字列は何度も現れるので、判定結果をこの呼び出しの間だけ覚えておく
+    checked = {}
+    for token in get_tokenizer().tokenize(text):
+        part = token.part_of_speech
+        keyword = checked.get(part)
+        if keyword is None:
+            keyword = checked[part] = pos_id(part) in _keyword_pos
+        if keyword:
+            yield token.surface
 
 def keyword_check(part): # ----------------------------------③
     """ 品詞が名詞であるか調べる関数
 
+    品詞情報ごとの判定結果はpos_id()が覚えているので、
+    同じ品詞情報に対して正規表現を使うのは最初の1回だけになる。
+
     Parameters:
         part(str): 形態素解析の品詞の部分。  
             
         Returns:
-            名詞であれば結果を格納したMatcオブジェクト、そうでなければNone。
+            bool: 名詞であればTrue、そうでなければFalse。
             
     """
-    return re.match( # -------------------------------------④
-        '名詞,(一般|固有名詞|サ変接続|形容動詞語幹)',
-        part
-        )
+    return is_keyword(pos_id(part)) # ----------------------④
@@ -0,0 +1,4 @@
+"""yukariエンジンのベンチマーク群
+
+リポジトリのルートで python -m benchmarks.<モジュール名> として実行する。
+"""
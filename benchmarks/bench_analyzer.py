@@ -0,0 +1,53 @@
+""" analyzer.analyze()の1秒あたりの呼び出し回数を計測する
+
+dics/log.txtのユーザー入力を順に解析して、
+・before: 呼び出しのたびにTokenizerを生成する（従来のanalyze()）
+・after : analyzer.tokenize()（スレッドごとに使い回すTokenizer）
+・cached: analyzer.analyze()（同じ文章の解析結果をキャッシュから返す）
+の1秒あたりの呼び出し回数を比較する。cachedは空のキャッシュから始める。
+
+    python -m benchmarks.bench_analyzer [--turns N]
+"""
+import argparse
+import sys
+import time
+import janome.tokenizer
+import analyzer
+from benchmarks.bench_pattern import load_inputs
+
+TURNS = 100
+
+def analyze_fresh(text):
+    """ 比較用の従来のanalyze()（毎回Tokenizerを生成する） """
+    t = janome.tokenizer.Tokenizer()
+    return [[token.surface, token.part_of_speech] for token in t.tokenize(text)]
+
+def calls_per_sec(func, inputs):
+    """ inputsを順にfuncに渡し、1秒あたりの呼び出し回数を返す """
+    start = time.perf_counter()
+    for text in inputs:
+        func(text)
+    return len(inputs) / (time.perf_counter() - start)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--turns', type = int, default = TURNS,
+                        help = '計測に使う入力の数 (default: %(default)s)')
+    args = parser.parse_args(argv)
+    inputs = load_inputs()[:args.turns]
+    print('inputs: {} turns'.format(len(inputs)))
+    # 1回目の呼び出しにはTokenizerの生成が含まれるので、
+    # 起動時にwarm_up()を呼んだ状態で計測する
+    analyzer.warm_up()
+    before = calls_per_sec(analyze_fresh, inputs)
+    after = calls_per_sec(analyzer.tokenize, inputs)
+    analyzer.cache.clear()
+    cached = calls_per_sec(analyzer.analyze, inputs)
+    print('{:>8} {:>12} {:>10}'.format('', 'calls/sec', 'speedup'))
+    for name, value in (('before', before), ('after', after), ('cached', cached)):
+        print('{:>8} {:>12.1f} {:>9.1f}x'.format(name, value, value / before))
+    print('cache:', analyzer.cache.info())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+""" 長い文章からキーワードを取り出す時間を計測する
+
+dics/log.txtのユーザー入力をつなげた長い文章について、
+・before: analyze()で全形態素を取り出してからkeyword_check()で選ぶ
+・after : extract_keywords()で名詞だけを1個ずつ取り出す
+の1回あたりの時間と、取り出す間に確保したメモリのピークを比較する。
+解析結果のキャッシュは使わない。
+
+    python -m benchmarks.bench_keywords [--length N]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import analyzer
+from benchmarks.bench_pattern import load_inputs
+
+LENGTH = 50000
+REPEAT = 3
+
+def keywords_by_analyze(text):
+    """ 比較用にanalyze()とkeyword_check()でキーワードを取り出す """
+    return [surface for surface, part in analyzer.analyze(text)
+            if analyzer.keyword_check(part)]
+
+def keywords_by_extract(text):
+    """ extract_keywords()でキーワードを取り出す """
+    return list(analyzer.extract_keywords(text))
+
+def per_call(func, text, repeat=REPEAT):
+    """ 1回あたりの最短時間（ミリ秒）を返す """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e3
+
+def peak_kb(func, text):
+    """ funcの実行中に確保したメモリのピーク(KB)を返す """
+    tracemalloc.start()
+    func(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--length', type = int, default = LENGTH,
+                        help = '文章の長さ（文字数） (default: %(default)s)')
+    args = parser.parse_args(argv)
+    inputs = load_inputs()
+    text = ''
+    while len(text) < args.length:
+        text += '。'.join(inputs) + '。'
+    text = text[:args.length]
+    analyzer.warm_up()
+    analyzer.cache.resize(0)
+    assert keywords_by_analyze(text) == keywords_by_extract(text)
+    before = per_call(keywords_by_analyze, text)
+    after = per_call(keywords_by_extract, text)
+    print('text: {} chars'.format(len(text)))
+    print('{:>8} {:>10} {:>10}'.format('', 'ms/call', 'peak(KB)'))
+    print('{:>8} {:>10.1f} {:>10.1f}'.format(
+        'before', before, peak_kb(keywords_by_analyze, text)))
+    print('{:>8} {:>10.1f} {:>10.1f}'.format(
+        'after', after, peak_kb(keywords_by_extract, text)))
+    print('speedup: {:.2f}x'.format(before / after))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+""" MainWindow.change_looks()の1ターンあたりの画面の更新時間を計測する
+
+dics/log.txtのユーザー入力を順にEmotionに渡して機嫌値の並びを作り、
+1ターンごとにchange_looks()を呼んでlabelShowImgを再描画(repaint)するまでの時間を
+・before: 毎ターンQPixmapをリソースから作ってsetPixmap()する（従来のchange_looks()）
+・after : デコード済みの画像を使い、表情が変わったときだけsetPixmap()する
+で比較する。画面のない環境ではQT_QPA_PLATFORM=offscreenで実行する。
+MainWindowが書き込む対話ログは一時ディレクトリに置き、dics/log.txtは変更しない。
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_looks [--turns N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from PyQt5 import QtGui, QtWidgets
+import dictionary
+import yukari
+from benchmarks.bench_pattern import load_inputs
+
+TURNS = 1000
+
+def legacy_change_looks(win):
+    """ 比較用の従来のchange_looks()（毎ターン画像をデコードする） """
+    em = win.mood
+    if -2 <= em < 1.5:
+        win.ui.labelShowImg.setPixmap(QtGui.QPixmap(":/re/img/talk.gif"))
+    elif -5 <= em < -2:
+        win.ui.labelShowImg.setPixmap(QtGui.QPixmap(":/re/img/empty.gif"))
+    elif -10 <= em < -5:
+        win.ui.labelShowImg.setPixmap(QtGui.QPixmap(":/re/img/angry.gif"))
+    elif 1.5 <= em <= 15:
+        win.ui.labelShowImg.setPixmap(QtGui.QPixmap(":/re/img/happy.gif"))
+
+def make_moods(turns):
+    """ 会話ログの入力をEmotionに渡して、ターンごとの機嫌値の並びを作る """
+    inputs = load_inputs()
+    emotion = yukari.Emotion(dictionary.Dictionary())
+    moods = []
+    for i in range(turns):
+        emotion.update(inputs[i % len(inputs)])
+        moods.append(float(emotion.mood))
+    return moods
+
+def frame_times(win, change, moods):
+    """ ターンごとにchange(win)と再描画にかかった時間（マイクロ秒）を返す """
+    times = []
+    for mood in moods:
+        win.mood = mood
+        start = time.perf_counter()
+        change(win)
+        win.ui.labelShowImg.repaint()
+        times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--turns', type = int, default = TURNS,
+                        help = '計測するターン数 (default: %(default)s)')
+    args = parser.parse_args(argv)
+    app = QtWidgets.QApplication(sys.argv[:1])
+    import mainWindow
+    # ログタイトルの書き込みとローテーションがdics/log.txtに及ばないようにする
+    with tempfile.TemporaryDirectory() as tmp:
+        mainWindow.MainWindow.LOG_PATH = os.path.join(tmp, 'log.txt')
+        mainWindow.MainWindow.TURN_LOG_PATH = None
+        return run(app, mainWindow, args.turns)
+
+def run(app, mainWindow, turns):
+    """ MainWindowを表示してbeforeとafterを計測し、結果を表示する """
+    win = mainWindow.MainWindow()
+    win.show()
+    app.processEvents()
+    moods = make_moods(turns)
+    changes = sum(1 for a, b in zip(moods, moods[1:])
+                  if win.expression(a) != win.expression(b))
+    print('turns: {}, expression changes: {}'.format(len(moods), changes))
+    results = [('before', frame_times(win, legacy_change_looks, moods)),
+               ('after', frame_times(win, mainWindow.MainWindow.change_looks, moods))]
+    print('{:>8} {:>10} {:>10} {:>10}'.format('', 'mean(us)', 'p50(us)', 'max(us)'))
+    for name, times in results:
+        print('{:>8} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+            name, statistics.mean(times), statistics.median(times), max(times)))
+    print('speedup: {:.1f}x'.format(
+        statistics.mean(results[0][1]) / statistics.mean(results[1][1])))
+    win.stopWorker()
+    win.writeLog()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+""" パターン辞書のマッチング1ターンあたりのレイテンシを計測する
+
+100行、1,000行、10,000行の合成パターン辞書を作り、
+dics/log.txtのユーザー入力を順にマッチさせて、
+・before: re.search(パターン文字列, 入力) （毎回reモジュールのキャッシュを引く）
+・after : PatternItem.match(入力) （コンパイル済みの正規表現を使う）
+・fused : PatternMatcher.match(入力) （キーワードはAho-Corasick法、
+          それ以外は束ねた正規表現で1回走査する）
+の1ターンあたりの平均時間を比較する。
+
+    python -m benchmarks.bench_pattern [--turns N]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import dictionary
+from logArchive import LogArchive
+
+SIZES = (100, 1000, 10000)
+LOG_PATH = 'dics/log.txt'
+TURNS = 50
+
+def load_inputs(path=LOG_PATH):
+    """ ログからユーザーの入力（'> 'で始まる行）を古い順に取り出す
+
+    ローテーションでログファイルが空になっても計測できるよう、
+    LogArchiveで圧縮したセグメントの入力も古い順に含める。
+
+    Parameters:
+        path(str): ログファイルのパス。
+
+    Returns:
+        strのlist: ユーザーの入力文字列のリスト。
+
+    Raises:
+        SystemExit: ログファイルにもセグメントにも入力がない場合。
+    """
+    logs = LogArchive(path)
+    lines = []
+    for segment in reversed(logs.segments()):
+        lines += logs.readSegment(segment)
+    lines += logs.readLines(path)
+    inputs = [line[2:] for line in lines if line.startswith('> ')]
+    if not inputs:
+        raise SystemExit('no user inputs in {} or its rotated segments'.format(path))
+    return inputs
+
+def make_pattern_file(path, size, base_path=dictionary.Dictionary.PATTERN_PATH):
+    """ 本物のパターン辞書の行を混ぜた合成パターン辞書をsize行ぶん書き出す
+
+    同じパターンの繰り返しにならないよう、キーワードには連番を付ける。
+    本物の辞書の行は末尾に置き、多くの入力が辞書全体を走査するようにする。
+
+    Parameters:
+        path(str): 書き出すファイルのパス。
+        size(int): 行数。
+        base_path(str): 元にするパターン辞書のパス。
+    """
+    with open(base_path, 'r', encoding = 'utf_8') as f:
+        base = [line.rstrip('\n') for line in f if line.strip()]
+    lines = ['0##キーワード{}\t0##キーワード{}だね'.format(i, i)
+             for i in range(max(size - len(base), 0))]
+    lines += base[:size - len(lines)]
+    with open(path, 'w', encoding = 'utf_8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def first_match(items, input, search):
+    """ Emotion.update()と同じく、最初にマッチしたPatternItemを探す """
+    for item in items:
+        if search(item, input):
+            return item
+    return None
+
+def per_turn(items, inputs, search, repeat=3, find=first_match):
+    """ 1ターンあたりの平均時間（マイクロ秒）を返す """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for input in inputs:
+            find(items, input, search)
+        elapsed = (time.perf_counter() - start) / len(inputs)
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    # beforeは辞書がreモジュールのキャッシュ(512件)を超えると
+    # 毎ターン全パターンを再コンパイルするため、ターン数を絞れるようにする。
+    parser.add_argument('--turns', type = int, default = TURNS,
+                        help = '計測に使う入力の数 (default: %(default)s)')
+    args = parser.parse_args(argv)
+    inputs = load_inputs()[:args.turns]
+    print('inputs: {} turns'.format(len(inputs)))
+    print('{:>8} {:>14} {:>14} {:>14} {:>8}'.format(
+        'lines', 'before(us)', 'after(us)', 'fused(us)', 'speedup'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            path = os.path.join(tmp, 'pattern{}.txt'.format(size))
+            make_pattern_file(path, size)
+            dic = dictionary.Dictionary(pattern_path = path)
+            before = per_turn(dic.pattern, inputs,
+                              lambda item, s: re.search(item.pattern, s))
+            after = per_turn(dic.pattern, inputs,
+                             lambda item, s: item.match(s))
+            fused = per_turn(dic.matcher, inputs, None,
+                             find = lambda m, s, _: m.match(s))
+            print('{:>8} {:>14.1f} {:>14.1f} {:>14.1f} {:>7.2f}x'.format(
+                size, before, after, fused, before / fused))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
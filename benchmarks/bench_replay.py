@@ -0,0 +1,155 @@
+""" 会話ログのユーザー入力を再生してyukari.dialogue()の性能を計測する
+
+ログからユーザーの入力を取り出し、画面なしのyukariに乱数のシードを固定して
+順に入力する。1秒あたりのターン数、1ターンの処理時間のp50/p95/p99と、
+yukari.last_turnに記録される段階ごとの処理時間を表示する。
+
+ログは次の形式を読み込める。
+・テキストのログ（dics/log.txtの「> 入力」の行）。--archiveを付けると
+  LogArchiveでローテーションしたセグメントの入力も古い順に含める。
+・JSON Lines形式のターンの記録（TurnLogが書き込む'input'）。拡張子が.jsonl。
+
+段階は次のとおり。
+  match   : パターン辞書の照合（最初にマッチするPatternItemまで）
+  emotion : 機嫌値の更新
+  select  : Responderの選択
+  response: 応答フレーズの選択（%match%の置き換えを含む）
+  total   : dialogue()全体
+
+    python -m benchmarks.bench_replay [--log PATH] [--archive] [--repeat N]
+                                      [--seed N] [--json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import yukari
+from logArchive import LogArchive
+from benchmarks.bench_pattern import LOG_PATH
+
+STAGES = ('match', 'emotion', 'select', 'response', 'total')
+SEED = 0
+REPEAT = 1
+
+def read_inputs(path, archive=False):
+    """ ログからユーザーの入力を古い順に取り出す
+
+    Parameters:
+        path(str): テキストのログ、またはJSON Lines形式のターンの記録のパス。
+        archive(bool): テキストのログのとき、ローテーションしたセグメントも読むならTrue。
+
+    Returns:
+        strのlist: ユーザーの入力。
+    """
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding = 'utf_8') as f:
+            return [json.loads(line)['input'] for line in f if line.strip()]
+    if archive:
+        logs = LogArchive(path)
+        lines = []
+        for segment in logs.segments()[::-1]:
+            lines += logs.readSegment(segment)
+        lines += logs.readLines(path)
+    else:
+        lines = LogArchive(path).readLines(path)
+    return [line[2:] for line in lines if line.startswith('> ')]
+
+def percentile(values, p):
+    """ 昇順に並べたvaluesのpパーセンタイル（最近傍法）を返す """
+    if not values:
+        return 0
+    k = max(0, min(len(values) - 1, round(p / 100 * len(values) + 0.5) - 1))
+    return values[k]
+
+def replay(inputs, seed=SEED, repeat=REPEAT):
+    """ 入力を順にdialogue()に渡し、ターンごとの記録を集める
+
+    Parameters:
+        inputs(strのlist): ユーザーの入力。
+        seed(int): 乱数のシード。
+        repeat(int): 入力全体を繰り返す回数。
+
+    Returns:
+        tuple: (ターンの記録のlist, 全体の経過時間（秒）)
+    """
+    random.seed(seed)
+    y = yukari.yukari('yukari')
+    records = []
+    # dialogue()は機嫌値を標準エラー出力に書くので、計測中は捨てる
+    with contextlib.redirect_stderr(io.StringIO()) as err:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in inputs:
+                y.dialogue(text)
+                records.append(y.last_turn)
+                err.seek(0)
+                err.truncate()
+        elapsed = time.perf_counter() - start
+    return records, elapsed
+
+def summarize(records, elapsed):
+    """ ターンの記録から計測結果をまとめる
+
+    Returns:
+        dic: {'turns', 'turns_per_sec', 'latency_us': {p50, p95, p99, max},
+              'stages_us': {段階: {mean, p50, p95, p99}}, 'responders': {名前: 回数}}
+    """
+    result = {'turns': len(records),
+              'turns_per_sec': len(records) / elapsed if elapsed else 0.0,
+              'stages_us': {}, 'responders': {}}
+    for stage in STAGES:
+        values = sorted(r['us'][stage] for r in records)
+        result['stages_us'][stage] = {
+            'mean': statistics.mean(values) if values else 0,
+            'p50': percentile(values, 50), 'p95': percentile(values, 95),
+            'p99': percentile(values, 99)}
+    total = sorted(r['us']['total'] for r in records)
+    result['latency_us'] = {'p50': percentile(total, 50), 'p95': percentile(total, 95),
+                            'p99': percentile(total, 99), 'max': total[-1] if total else 0}
+    for r in records:
+        result['responders'][r['responder']] = result['responders'].get(r['responder'], 0) + 1
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--log', default = LOG_PATH,
+                        help = '再生するログ（.jsonlはターンの記録） (default: %(default)s)')
+    parser.add_argument('--archive', action = 'store_true',
+                        help = 'ローテーションしたセグメントの入力も再生する')
+    parser.add_argument('--repeat', type = int, default = REPEAT,
+                        help = '入力全体を繰り返す回数 (default: %(default)s)')
+    parser.add_argument('--seed', type = int, default = SEED,
+                        help = '乱数のシード (default: %(default)s)')
+    parser.add_argument('--json', action = 'store_true',
+                        help = '計測結果をJSONで出力する')
+    args = parser.parse_args(argv)
+    inputs = read_inputs(args.log, args.archive)
+    if not inputs:
+        print('no inputs in {}'.format(args.log), file = sys.stderr)
+        return 1
+    result = summarize(*replay(inputs, args.seed, args.repeat))
+    if args.json:
+        print(json.dumps(result, ensure_ascii = False, indent = 1))
+        return 0
+    print('log: {} ({} inputs x {})'.format(
+        os.path.relpath(args.log), len(inputs), args.repeat))
+    print('turns: {}, {:.1f} turns/sec'.format(result['turns'], result['turns_per_sec']))
+    latency = result['latency_us']
+    print('latency(us): p50 {} p95 {} p99 {} max {}'.format(
+        latency['p50'], latency['p95'], latency['p99'], latency['max']))
+    print('{:>9} {:>9} {:>7} {:>7} {:>7}'.format('stage(us)', 'mean', 'p50', 'p95', 'p99'))
+    for stage in STAGES:
+        s = result['stages_us'][stage]
+        print('{:>9} {:>9.1f} {:>7} {:>7} {:>7}'.format(
+            stage, s['mean'], s['p50'], s['p95'], s['p99']))
+    print('responders:', ', '.join('{} {}'.format(name, n)
+                                   for name, n in sorted(result['responders'].items())))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
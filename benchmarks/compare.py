@@ -0,0 +1,203 @@
+""" ベンチマークの結果を基準値と比べて、性能の劣化を検出する
+
+benchmarks.suiteを実行し（または--currentで保存済みの結果を読み込み）、
+リポジトリに含めた基準値benchmarks/baseline.jsonと項目ごとに比べて表を表示する。
+許容範囲を超えて遅くなった項目や、判定に使う項目が今回の結果にない場合
+（計測が途中で失敗した、項目を絞り込みすぎたなど）は終了コード1を返す。
+
+基準値のファイルは次の形式で、--updateで今回の結果を基準値として書き込む
+（toleranceはそのまま残す）。
+
+  {"meta": 基準値を計測した環境,
+   "tolerance": {項目名（[行数]を除く）: 許容する遅れの割合, ...},
+   "results": {項目名: {"min_us": 1回あたりの時間の最小値, ...}, ...}}
+
+比べるのは計測ごとの最小値（min_us）で、ほかの処理の影響を受けにくい。
+それでも実行するたびに数十%ずれることがあるので、スイートを--runs回実行し、
+基準値には各回の最小値の中央値を、判定には各回の最小値のうち最も小さい値を使う。
+toleranceに載っている項目だけを判定に使い、それ以外は表示だけを行う。
+計測する項目と辞書の行数は基準値のファイルに合わせる。
+計測環境（Pythonのバージョンやマシン）が基準値と異なる場合は警告を出す。
+
+    python -m benchmarks.compare [--baseline PATH] [--current PATH]
+                                 [--repeat N] [--runs N] [--update]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+from benchmarks import suite
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# 基準値のファイルがないときに使う許容範囲。
+# 辞書の読み込みは1回の計測が長く回数が少ないため、ばらつきが大きい
+TOLERANCE = {'dictionary_load': 0.50, 'dictionary_load_snapshot': 0.50,
+             'responder_response': 0.40, 'analyze': 0.40}
+# 比べる計測値
+METRIC = 'min_us'
+# スイートを実行する回数
+RUNS = 3
+# 計測環境として比べるmetaの項目
+ENVIRONMENT = ('version', 'implementation', 'python', 'machine')
+
+def base_name(name):
+    """ 項目名から[行数]を除いた名前を返す """
+    return name.split('[', 1)[0]
+
+def merge_runs(suites, pick):
+    """ 複数回実行したスイートの結果を1つにまとめる
+
+    Parameters:
+        suites(dicのlist): benchmarks.suite.run_suite()の結果。
+        pick(callable): 項目ごとのMETRICの値のlistから1つの値を選ぶ関数。
+
+    Returns:
+        dic: run_suite()と同じ形式の結果。METRIC以外の値は最初の回のもの。
+    """
+    merged = {'meta': dict(suites[0]['meta'], runs = len(suites)), 'results': {}}
+    for name, result in suites[0]['results'].items():
+        values = [suite['results'][name][METRIC] for suite in suites
+                  if name in suite['results']]
+        merged['results'][name] = dict(result)
+        merged['results'][name][METRIC] = pick(values)
+    return merged
+
+def compare(baseline, current):
+    """ 基準値と今回の結果を比べる
+
+    Parameters:
+        baseline(dic): 基準値のファイルの内容。
+        current(dic): benchmarks.suite.run_suite()の結果。
+
+    Returns:
+        dicのlist: 項目ごとの{'name', 'baseline', 'current', 'change',
+                   'tolerance', 'status'}。statusは
+                   'ok', 'faster', 'REGRESSED', 'info', 'MISSING', 'missing',
+                   'new'のいずれか。MISSINGは判定に使う項目が今回の結果にないこと、
+                   missingは表示だけの項目が今回の結果にないことを示す。
+    """
+    tolerance = baseline.get('tolerance', {})
+    base = baseline.get('results', {})
+    cur = current.get('results', {})
+    rows = []
+    for name in sorted(set(base) | set(cur)):
+        row = {'name': name, 'baseline': None, 'current': None, 'change': None,
+               'tolerance': tolerance.get(base_name(name))}
+        if name in base:
+            row['baseline'] = base[name][METRIC]
+        if name in cur:
+            row['current'] = cur[name][METRIC]
+        if row['baseline'] is None:
+            row['status'] = 'new'
+        elif row['current'] is None:
+            row['status'] = 'missing' if row['tolerance'] is None else 'MISSING'
+        else:
+            row['change'] = row['current'] / row['baseline'] - 1
+            if row['tolerance'] is None:
+                row['status'] = 'info'
+            elif row['change'] > row['tolerance']:
+                row['status'] = 'REGRESSED'
+            elif row['change'] < -row['tolerance']:
+                row['status'] = 'faster'
+            else:
+                row['status'] = 'ok'
+        rows.append(row)
+    return rows
+
+def format_table(rows):
+    """ compare()の結果を表示用の行のリストにする """
+    def us(value):
+        return '-' if value is None else '{:.2f}'.format(value)
+
+    def percent(value):
+        return '-' if value is None else '{:+.1f}%'.format(value * 100)
+
+    lines = ['{:<34} {:>12} {:>12} {:>9} {:>7}  {}'.format(
+        'benchmark', 'baseline(us)', 'current(us)', 'change', 'limit', 'status')]
+    # 時間はmin_us（計測ごとの1回あたりの時間の最小値）
+    for row in rows:
+        lines.append('{:<34} {:>12} {:>12} {:>9} {:>7}  {}'.format(
+            row['name'], us(row['baseline']), us(row['current']),
+            percent(row['change']),
+            '-' if row['tolerance'] is None else '+{:.0f}%'.format(row['tolerance'] * 100),
+            row['status']))
+    return lines
+
+def environment_warnings(baseline, current):
+    """ 計測環境が基準値と異なる項目の警告文を返す """
+    warnings = []
+    for key in ENVIRONMENT:
+        old = baseline.get('meta', {}).get(key)
+        new = current.get('meta', {}).get(key)
+        if old != new:
+            warnings.append('warning: {} differs from baseline ({} -> {})'.format(
+                key, old, new))
+    return warnings
+
+def load_json(path):
+    """ JSONファイルを読み込む """
+    with open(path, 'r', encoding = 'utf_8') as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--baseline', default = BASELINE_PATH,
+                        help = '基準値のファイル (default: %(default)s)')
+    parser.add_argument('--current',
+                        help = '比べる結果（benchmarks.suiteの出力）。省略すると計測する')
+    parser.add_argument('--repeat', type = int, default = suite.REPEAT,
+                        help = '項目ごとの計測の回数 (default: %(default)s)')
+    parser.add_argument('--runs', type = int, default = RUNS,
+                        help = 'スイートを実行する回数 (default: %(default)s)')
+    parser.add_argument('--update', action = 'store_true',
+                        help = '今回の結果を基準値として書き込む')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.baseline):
+        baseline = load_json(args.baseline)
+    elif args.update:
+        baseline = {'tolerance': dict(TOLERANCE), 'results': {}}
+    else:
+        print('baseline not found: {} (run with --update to create it)'.format(
+            args.baseline), file = sys.stderr)
+        return 2
+
+    if args.current:
+        current = load_json(args.current)
+    else:
+        # 基準値と同じ項目、同じ辞書の行数で計測する。
+        # 基準値がまだなければ許容範囲の決まっている項目を計測する
+        names = sorted({base_name(name) for name in baseline['results']}
+                       or baseline['tolerance'])
+        sizes = baseline.get('meta', {}).get('sizes', list(suite.SIZES))
+        suites = [suite.run_suite(sizes, names, args.repeat, log = sys.stderr)
+                  for _ in range(max(args.runs, 1))]
+        # 基準値は典型的な値（中央値）、判定は最も速かった回の値を使う
+        current = merge_runs(suites, statistics.median if args.update else min)
+
+    if args.update:
+        baseline['meta'] = current['meta']
+        baseline['results'] = current['results']
+        with open(args.baseline, 'w', encoding = 'utf_8') as f:
+            json.dump(baseline, f, ensure_ascii = False, indent = 1, sort_keys = True)
+            f.write('\n')
+        print('baseline updated: {}'.format(args.baseline))
+        return 0
+
+    for warning in environment_warnings(baseline, current):
+        print(warning)
+    rows = compare(baseline, current)
+    print('\n'.join(format_table(rows)))
+    regressed = [row['name'] for row in rows if row['status'] == 'REGRESSED']
+    missing = [row['name'] for row in rows if row['status'] == 'MISSING']
+    if regressed:
+        print('\n{} benchmark(s) regressed beyond tolerance: {}'.format(
+            len(regressed), ', '.join(regressed)))
+    if missing:
+        print('\n{} gated benchmark(s) missing from the results: {}'.format(
+            len(missing), ', '.join(missing)))
+    return 1 if regressed or missing else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
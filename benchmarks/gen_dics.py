@@ -0,0 +1,244 @@
+""" 規模を変えた合成のパターン辞書とランダム辞書を作る
+
+同梱のdics/pattern.txt（約120行）とdics/random.txt（約280行）では
+辞書の行数に比例する処理の遅さが見えないため、実際の運用に近い
+10,000行、100,000行、1,000,000行の辞書を作って読み込み、マッチング、
+メモリ使用量を計測できるようにする。
+
+パターン辞書の各行は同梱の辞書と同じ形式で、次のものを混ぜる。
+・キーワードだけのパターン（'チョコ'、'バイバイ|ばいばい'）
+・正規表現のパターン（'こんにち(は|わ)$'、'^どれ[？?]$'のような位置指定や選択）
+・機嫌変動値（'-5##バカ'）と必要機嫌値付きの応答フレーズのグループ
+  （'0##そうなんだ|-5##しばいたろか？'）
+・%match%を含む応答フレーズ（'%match%ってホント！？'）
+キーワードにはカタカナの連番を付けて行ごとに異なるパターンにする。
+同梱の辞書の行も含め、パターン辞書では末尾に置いて多くの入力が
+辞書全体を走査するようにする。乱数のシードが同じなら同じ辞書になる。
+
+辞書は--outputのディレクトリに行数ごとのディレクトリを作って書き出す。
+スナップショットは作らない（書き出すときに古いものは消す）。必要なら
+Dictionary(random_path, pattern_path).saveSnapshot()で同じディレクトリに作る。
+
+  benchmarks/dics/10000/pattern.txt, random.txt
+  benchmarks/dics/100000/pattern.txt, random.txt
+  ...
+
+--measureを付けると、行数ごとに別プロセスで辞書を読み込み、
+読み込み時間、RSSの増加量、dics/log.txtの入力1ターンあたりの照合時間を表示する。
+
+    python -m benchmarks.gen_dics [--sizes N ...] [--output DIR] [--seed N]
+                                  [--no-base] [--measure]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import dictionary
+from benchmarks.bench_pattern import load_inputs
+from benchmarks.mem_pattern import rss_kb
+
+SIZES = (10000, 100000, 1000000)
+OUTPUT = os.path.join(os.path.dirname(__file__), 'dics')
+SEED = 0
+# パターンの種類の割合（同梱の辞書はほとんどがキーワードだけのパターン）
+KINDS = (('literal', 70), ('regex', 30))
+# 機嫌変動値と必要機嫌値（同梱の辞書と同じく0と小さな値が多い）
+MODIFIES = (0, 0, 1, 1, 1, 1, 2, -2, 5, -5)
+NEEDS = (0, 0, 0, 0, 0, 0, 3, -3, 5, -5, 10, -10)
+# 応答フレーズに%match%を含める行の割合
+MATCH_RATE = 0.15
+# 1行あたりの応答フレーズの数
+PHRASES = (1, 6)
+
+NOUNS = ('チョコ', 'グミ', 'マシュマロ', 'あんこ', 'ラーメン', '餃子', 'タピオカ',
+         'パンケーキ', '自転車', '電車', '海', '山', '温泉', '花火', '映画', '音楽',
+         'ゲーム', 'マンガ', '小説', '宿題', 'テスト', '部活', '先生', '友だち',
+         '猫', '犬', 'うさぎ', '天気', '雨', '雪', '春', '夏', '秋', '冬', '朝',
+         '夜', '週末', '旅行', 'カフェ', 'ケーキ', 'アイス', 'プール', '図書館',
+         'お弁当', 'ドラマ', 'アニメ', '歌', 'ダンス', 'サッカー', '野球')
+KANA = 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン'
+# 正規表現のパターンの型。{w}と{v}にキーワードが入る
+REGEXES = ('{w}(は|わ)$', '^{w}[？?]$', '^{w}[、。！]*$', '{w}(が|も)(好き|すき)',
+           '^(お|うい){w}$', '{w}|^{v}$', '({w}|{v})(だ|です)よね', '^[し知]ら[なね]{w}')
+# 応答フレーズの型。{n}に名詞が入る
+PHRASE_TEMPLATES = ('{n}いいよね！', '{n}の話しようよ', 'また{n}？', '{n}好きなんだ',
+                    'そうなんだ', 'へえー', '{n}ならまかせて！', 'ふーん', '{n}よこせ！',
+                    'それな', 'ほんとに？', '今度{n}行こうよ')
+MATCH_TEMPLATES = ('%match%ってホント！？', '%match%じゃないもん！', '%match%って誰のこと？',
+                   '%match%かぁ', 'だれが%match%なのよ！')
+# ランダム辞書の文の型
+RANDOM_TEMPLATES = ('{n}が食べたいな', '今日は{n}の日だよ', '{n}って知ってる？',
+                    '{n}の夢を見たよ', '{n}とか興味ある？', 'そういえば{n}どうなった？',
+                    '{n}{m}回目だね', '{n}はいいぞ')
+
+def kana_code(i):
+    """ 整数をカタカナの連番にする（0は'ア'） """
+    code = ''
+    while True:
+        i, r = divmod(i, len(KANA))
+        code = KANA[r] + code
+        if i == 0:
+            return code
+        i -= 1
+
+def keyword(rnd, i):
+    """ i番目のキーワード（名詞+カタカナの連番）を作る """
+    return rnd.choice(NOUNS) + kana_code(i)
+
+def phrase_group(rnd):
+    """ '必要機嫌値##応答フレーズ'を|で区切った応答フレーズのグループを作る """
+    templates = PHRASE_TEMPLATES
+    if rnd.random() < MATCH_RATE:
+        templates = PHRASE_TEMPLATES + MATCH_TEMPLATES * 2
+    return '|'.join('{}##{}'.format(rnd.choice(NEEDS),
+                                    rnd.choice(templates).format(n = rnd.choice(NOUNS)))
+                    for _ in range(rnd.randint(*PHRASES)))
+
+def pattern_lines(size, seed=SEED):
+    """ 合成パターン辞書の行を作るジェネレーター
+
+    Parameters:
+        size(int): 行数。
+        seed(int): 乱数のシード。
+
+    Yields:
+        str: '機嫌変動値##パターン[TAB]応答フレーズのグループ'（改行なし）。
+    """
+    rnd = random.Random(seed)
+    kinds = [kind for kind, weight in KINDS for _ in range(weight)]
+    n = 0
+    for _ in range(size):
+        if rnd.choice(kinds) == 'literal':
+            # 表記ゆれのように1～3個のキーワードを|で並べる
+            words = [keyword(rnd, n + k) for k in range(rnd.choice((1, 1, 1, 2, 3)))]
+            pattern = '|'.join(words)
+        else:
+            words = [keyword(rnd, n), keyword(rnd, n + 1)]
+            pattern = rnd.choice(REGEXES).format(w = words[0], v = words[1])
+        n += len(words)
+        yield '{}##{}\t{}'.format(rnd.choice(MODIFIES), pattern, phrase_group(rnd))
+
+def random_lines(size, seed=SEED):
+    """ 合成ランダム辞書の行を作るジェネレーター
+
+    Parameters:
+        size(int): 行数。
+        seed(int): 乱数のシード。
+
+    Yields:
+        str: ランダム辞書1行の応答フレーズ（改行なし）。
+    """
+    rnd = random.Random(seed)
+    for _ in range(size):
+        yield rnd.choice(RANDOM_TEMPLATES).format(n = rnd.choice(NOUNS),
+                                                  m = rnd.randint(2, 99))
+
+def read_base(path):
+    """ 同梱の辞書の空でない行を読み込む """
+    with open(path, 'r', encoding = 'utf_8') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+def write_dics(dir, size, seed=SEED, base=True):
+    """ size行の合成パターン辞書とランダム辞書をdirに書き出す
+
+    Parameters:
+        dir(str): 書き出すディレクトリ。なければ作る。
+        size(int): それぞれの辞書の行数。
+        seed(int): 乱数のシード。
+        base(bool): Trueなら同梱の辞書の行を含める。
+
+    Returns:
+        tuple: (ランダム辞書のパス, パターン辞書のパス)
+    """
+    os.makedirs(dir, exist_ok = True)
+    random_path = os.path.join(dir, 'random.txt')
+    pattern_path = os.path.join(dir, 'pattern.txt')
+    base_pattern = read_base(dictionary.Dictionary.PATTERN_PATH)[:size] if base else []
+    base_random = read_base(dictionary.Dictionary.RANDOM_PATH)[:size] if base else []
+    with open(pattern_path, 'w', encoding = 'utf_8') as f:
+        for line in pattern_lines(size - len(base_pattern), seed):
+            f.write(line + '\n')
+        for line in base_pattern:
+            f.write(line + '\n')
+    with open(random_path, 'w', encoding = 'utf_8') as f:
+        for line in base_random:
+            f.write(line + '\n')
+        for line in random_lines(size - len(base_random), seed):
+            f.write(line + '\n')
+    # 古いスナップショットを読み込まないように消しておく
+    snapshot = os.path.join(dir, dictionary.Dictionary.SNAPSHOT_NAME)
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+    return random_path, pattern_path
+
+def measure(dir):
+    """ dirの辞書を読み込み、読み込み時間、RSSの増加量、1ターンの照合時間を返す
+
+    RSSを正しく計測するため、別プロセスで呼び出す。
+    """
+    inputs = load_inputs()
+    start_rss = rss_kb()
+    start = time.perf_counter()
+    dic = dictionary.Dictionary(os.path.join(dir, 'random.txt'),
+                                os.path.join(dir, 'pattern.txt'), snapshot = False)
+    load = time.perf_counter() - start
+    end_rss = rss_kb()
+    start = time.perf_counter()
+    for input in inputs:
+        dic.matcher.match(input)
+    turn = (time.perf_counter() - start) / len(inputs) if inputs else 0
+    return {'pattern': len(dic.pattern), 'random': len(dic.random),
+            'regexes': sum(item.literals is None for item in dic.pattern),
+            'load_s': load, 'match_us': turn * 1e6,
+            'rss_kb': None if start_rss is None else end_rss - start_rss}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--sizes', type = int, nargs = '+', default = list(SIZES),
+                        help = '辞書の行数 (default: %(default)s)')
+    parser.add_argument('--output', default = OUTPUT,
+                        help = '書き出すディレクトリ (default: %(default)s)')
+    parser.add_argument('--seed', type = int, default = SEED,
+                        help = '乱数のシード (default: %(default)s)')
+    parser.add_argument('--no-base', dest = 'base', action = 'store_false',
+                        help = '同梱の辞書の行を含めない')
+    parser.add_argument('--measure', action = 'store_true',
+                        help = '作った辞書の読み込み時間、メモリ、照合時間を計測する')
+    parser.add_argument('--load', metavar = 'DIR', help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # 子プロセスとして1つの辞書だけを読み込む
+    if args.load:
+        print(json.dumps(measure(args.load)))
+        return 0
+
+    dirs = []
+    for size in args.sizes:
+        dir = os.path.join(args.output, str(size))
+        start = time.perf_counter()
+        paths = write_dics(dir, size, args.seed, args.base)
+        print('{:>8} lines: {} ({:.1f} MB), {} ({:.1f} MB) in {:.1f} s'.format(
+            size, paths[1], os.path.getsize(paths[1]) / 2 ** 20,
+            paths[0], os.path.getsize(paths[0]) / 2 ** 20,
+            time.perf_counter() - start), flush = True)
+        dirs.append((size, dir))
+    if not args.measure:
+        return 0
+
+    print('{:>8} {:>10} {:>10} {:>12} {:>10}'.format(
+        'lines', 'load(s)', 'rss(MB)', 'match(us)', 'regexes'))
+    for size, dir in dirs:
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.gen_dics', '--load', dir],
+            check = True, stdout = subprocess.PIPE, universal_newlines = True)
+        r = json.loads(out.stdout)
+        print('{:>8} {:>10.2f} {:>10} {:>12.1f} {:>10}'.format(
+            size, r['load_s'],
+            '-' if r['rss_kb'] is None else '{:.1f}'.format(r['rss_kb'] / 1024),
+            r['match_us'], r['regexes']), flush = True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+""" python -X importtimeでモジュールごとの起動時間を計測する
+
+各モジュールを別プロセスで「python -X importtime -c "import モジュール"」として
+読み込み、importにかかった累計時間と、時間のかかった依存モジュールを表示する。
+あわせて、PyQt5やjanomeのような重いライブラリが読み込まれたかを調べる。
+
+対話の本体（yukari、responder、dictionaryなど）はPyQt5とjanomeを読み込まない。
+--checkを付けると、これが崩れていた場合に終了コード1を返す。
+
+計測結果はbenchmarks/import_time.txtに保存してリポジトリに含めておき、
+起動時間が延びていないかを差分で確認する。
+
+    python -m benchmarks.import_time [--repeat N] [--top N] [--output PATH] [--check]
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+# 計測するモジュール
+MODULES = ('patternItem', 'matcher', 'mappedRandom', 'dictionary',
+           'responder', 'yukari', 'console', 'analyzer', 'mainWindow')
+# 対話の本体として、重いライブラリを読み込んではいけないモジュール
+CORE_MODULES = ('patternItem', 'matcher', 'mappedRandom', 'dictionary',
+                'responder', 'yukari', 'console', 'analyzer')
+# 読み込まれたかを調べる重いライブラリ
+HEAVY_PACKAGES = ('PyQt5', 'janome', 'qt_resource_rc', 'multiprocessing')
+REPEAT = 5
+TOP = 5
+
+# -X importtimeの出力行「import time: self [us] | cumulative | imported package」
+LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$')
+
+def import_time(module):
+    """ 別プロセスでmoduleをimportし、-X importtimeの出力を解析する
+
+    Parameters:
+        module(str): 計測するモジュール名。
+
+    Returns:
+        dic: {'total': 累計時間(us), 'imports': {モジュール名: (自身の時間, 累計時間)}}
+             importに失敗した場合は{'error': 例外の最後の行}。
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+        universal_newlines = True)
+    imports = {}
+    errors = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            imports[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+        elif not line.startswith('import time:'):
+            errors.append(line)
+    if proc.returncode != 0:
+        return {'error': errors[-1] if errors else 'exit {}'.format(proc.returncode)}
+    return {'total': imports[module][1], 'imports': imports}
+
+def best_of(module, repeat):
+    """ repeat回計測して累計時間が最も短かった結果を返す
+
+    1回目は.pycの作成を含むことがあるので、最短の結果を使う。
+    """
+    best = None
+    for _ in range(repeat):
+        result = import_time(module)
+        if 'error' in result:
+            return result
+        if best is None or result['total'] < best['total']:
+            best = result
+    return best
+
+def heavy(result):
+    """ 読み込まれた重いライブラリの名前をリストにして返す """
+    return [name for name in HEAVY_PACKAGES
+            if any(m == name or m.startswith(name + '.')
+                   for m in result['imports'])]
+
+def report(results, top):
+    """ 計測結果を表示用の文字列の行にして返す """
+    lines = ['python {}'.format(sys.version.split()[0]), '',
+             '{:<14} {:>10}  {}'.format('module', 'total(ms)', 'heavy imports')]
+    for module, result in results:
+        if 'error' in result:
+            lines.append('{:<14} {:>10}  skipped: {}'.format(
+                module, '-', result['error']))
+            continue
+        lines.append('{:<14} {:>10.1f}  {}'.format(
+            module, result['total'] / 1000, ', '.join(heavy(result)) or '-'))
+    for module, result in results:
+        if 'error' in result:
+            continue
+        lines.append('')
+        lines.append('{}: slowest imports (cumulative ms)'.format(module))
+        slowest = sorted(((cumulative, name) for name, (self_us, cumulative)
+                          in result['imports'].items() if name != module),
+                         reverse = True)[:top]
+        for cumulative, name in slowest:
+            lines.append('  {:>10.1f}  {}'.format(cumulative / 1000, name))
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--repeat', type = int, default = REPEAT,
+                        help = 'モジュールごとの計測回数 (default: %(default)s)')
+    parser.add_argument('--top', type = int, default = TOP,
+                        help = '表示する依存モジュールの数 (default: %(default)s)')
+    parser.add_argument('--output', help = '計測結果を保存するファイル')
+    parser.add_argument('--check', action = 'store_true',
+                        help = '対話の本体がPyQt5やjanomeを読み込んだら失敗する')
+    parser.add_argument('modules', nargs = '*', default = list(MODULES),
+                        help = '計測するモジュール (default: %(default)s)')
+    args = parser.parse_args(argv)
+    results = [(module, best_of(module, args.repeat)) for module in args.modules]
+    lines = report(results, args.top)
+    print('\n'.join(lines))
+    if args.output:
+        with open(args.output, 'w', encoding = 'utf_8') as f:
+            f.write('\n'.join(lines) + '\n')
+    if args.check:
+        failed = [module for module, result in results
+                  if module in CORE_MODULES and 'error' not in result
+                  and set(heavy(result)) & {'PyQt5', 'janome', 'qt_resource_rc'}]
+        if failed:
+            print('heavy imports in core modules:', ', '.join(failed),
+                  file = sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+""" パターン辞書を読み込んだときのメモリ使用量(RSS)を比較する
+
+応答フレーズが合計1,000,000個の合成パターン辞書を作り、
+・before : 応答フレーズ1個ごとに{'need', 'phrase'}の辞書を持つ従来のPatternItem
+           （元のPatternItemと同じく、コンパイル済みの正規表現は持たない）
+・after  : __slots__と必要機嫌値の配列、共有した応答フレーズを持つPatternItem
+でそれぞれ読み込んだときのRSSの増加量を、別プロセスで計測して比較する。
+
+    python -m benchmarks.mem_pattern [--lines N] [--phrases N]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+from patternItem import PatternItem
+
+LINES = 100000
+PHRASES = 10
+
+class LegacyPatternItem:
+    """比較用の従来のPatternItem（応答フレーズは辞書のリスト、正規表現は毎回コンパイル）"""
+    def __init__(self, pattern, phrases):
+        m = re.findall(PatternItem.SEPARATOR, pattern)
+        self.modify = 0
+        if m[0][1]:
+            self.modify = int(m[0][1])
+        self.pattern = m[0][2]
+        self.phrases = []
+        for phrase in phrases.split('|'):
+            m = re.findall(PatternItem.SEPARATOR, phrase)
+            dic = {'need': 0, 'phrase': m[0][2]}
+            if m[0][1]:
+                dic['need'] = int(m[0][1])
+            self.phrases.append(dic)
+
+def rss_kb():
+    """ 現在のプロセスのRSS(KB)を返す。取得できなければNone。 """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # /procがない環境では最大RSSで代用する（macOSはバイト単位）
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def make_pattern_file(path, lines, phrases, seed=0):
+    """ lines行 x phrases個の応答フレーズを持つ合成パターン辞書を書き出す
+
+    学習した辞書と同じように、応答フレーズには重複を含める。
+    """
+    rnd = random.Random(seed)
+    pool = ['応答フレーズ{}だよ'.format(i) for i in range(lines * phrases // 4)]
+    with open(path, 'w', encoding = 'utf_8') as f:
+        for i in range(lines):
+            group = '|'.join('{}##{}'.format(rnd.choice((0, 0, 0, 3, -3)),
+                                             rnd.choice(pool))
+                             for _ in range(phrases))
+            f.write('0##キーワード{}\t{}\n'.format(i, group))
+
+def load(kind, path):
+    """ 指定した実装でパターン辞書を読み込み、RSSの増加量を返す """
+    cls = {'before': LegacyPatternItem, 'after': PatternItem}[kind]
+    with open(path, 'r', encoding = 'utf_8') as f:
+        lines = [line.rstrip('\n') for line in f]
+    start = rss_kb()
+    items = [cls(*line.split('\t')) for line in lines if line]
+    end = rss_kb()
+    phrases = sum(len(item.phrases) for item in items)
+    return {'kind': kind, 'items': len(items), 'phrases': phrases,
+            'rss_kb': None if start is None else end - start}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--lines', type = int, default = LINES,
+                        help = 'パターン辞書の行数 (default: %(default)s)')
+    parser.add_argument('--phrases', type = int, default = PHRASES,
+                        help = '1行あたりの応答フレーズの数 (default: %(default)s)')
+    parser.add_argument('--load', nargs = 2, metavar = ('KIND', 'PATH'),
+                        help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # 子プロセスとして1つの実装だけを読み込む
+    if args.load:
+        print(json.dumps(load(*args.load)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'pattern.txt')
+        make_pattern_file(path, args.lines, args.phrases)
+        results = []
+        for kind in ('before', 'after'):
+            out = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.mem_pattern',
+                 '--load', kind, path],
+                check = True, stdout = subprocess.PIPE, universal_newlines = True)
+            results.append(json.loads(out.stdout))
+    print('{:>8} {:>10} {:>10} {:>12} {:>14}'.format(
+        'kind', 'items', 'phrases', 'rss(MB)', 'bytes/phrase'))
+    for r in results:
+        if r['rss_kb'] is None:
+            print('{:>8} {:>10} {:>10} {:>12} {:>14}'.format(
+                r['kind'], r['items'], r['phrases'], '-', '-'))
+            continue
+        print('{:>8} {:>10} {:>10} {:>12.1f} {:>14.1f}'.format(
+            r['kind'], r['items'], r['phrases'], r['rss_kb'] / 1024,
+            r['rss_kb'] * 1024 / r['phrases']))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
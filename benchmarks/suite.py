@@ -0,0 +1,212 @@
+""" 辞書、マッチング、形態素解析のホットパスのマイクロベンチマーク
+
+標準ライブラリ（timeit）だけで次の処理の1回あたりの時間を計測し、
+結果をJSONで出力する。辞書の大きさごとに計測する項目は合成辞書の行数で
+パラメーター化する（項目名の[]内が行数）。合成辞書はbenchmarks.gen_dicsで作るので、
+行数に比例して正規表現のパターン（約3割）も増え、PatternMatcherの束ねた正規表現の
+区切り（CHUNK_SIZE）も行数に応じて増える。
+
+  dictionary_load[N]          Dictionary()の読み込み（スナップショットなし）
+  dictionary_load_snapshot[N] Dictionary()の読み込み（スナップショットあり）
+  pattern_match[N]            辞書の全PatternItemのPatternItem.match()を1巡
+  pattern_choice[N]           辞書の全PatternItemのPatternItem.choice()を1巡
+  responder_response[N]       全入力のPatternResponder.response()を1巡（照合を含む）
+  emotion_update[N]           全入力のEmotion.update()を1巡（照合を含む）
+  make_line[N]                辞書の全PatternItemのmake_line()を1巡
+  analyze                     全入力のanalyzer.analyze()を1巡（キャッシュなし）
+  analyze_cached              全入力のanalyzer.analyze()を1巡（キャッシュあり）
+
+入力にはdics/log.txtのユーザー入力を順に使う。入力ごとの処理時間の差は大きいので、
+比較に使う項目は計測のたびに同じ入力を処理するよう、全入力を1巡する時間を計る。結果は
+{'meta': 実行環境, 'results': {項目名: {'us': 1回あたりの時間の中央値, ...}}}
+の形で、--outputで指定したファイルに保存すると実行ごとの差分を比べられる。
+
+    python -m benchmarks.suite [--sizes N ...] [--only NAME ...]
+                               [--repeat N] [--output PATH]
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import analyzer
+import dictionary
+import responder
+import yukari
+from benchmarks import gen_dics
+from benchmarks.bench_pattern import load_inputs
+
+SIZES = (1000, 10000)
+REPEAT = 5
+# 1回の計測にかける時間の目安（秒）
+TARGET = 0.1
+VERSION = 2
+
+def measure(func, repeat=REPEAT, target=TARGET):
+    """ funcの1回あたりの時間を計測する
+
+    timeitと同じく、1回の計測がtarget秒を超えるまで呼び出し回数を増やし、
+    その回数でrepeat回計測する。
+
+    Parameters:
+        func(callable): 引数なしで呼び出す関数。
+        repeat(int): 計測の回数。
+        target(float): 1回の計測にかける時間の目安（秒）。
+
+    Returns:
+        dic: {'us': 中央値, 'min_us': 最小値, 'max_us': 最大値,
+              'number': 1回の計測での呼び出し回数, 'repeat': 計測の回数}
+              時間は呼び出し1回あたりのマイクロ秒。
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= target or number >= 10 ** 6:
+            break
+        number *= 10
+    times = [t / number * 1e6 for t in timer.repeat(repeat, number)]
+    return {'us': statistics.median(times), 'min_us': min(times),
+            'max_us': max(times), 'number': number, 'repeat': repeat}
+
+def cycle(inputs):
+    """ 入力を順に返す関数を作る """
+    it = itertools.cycle(inputs)
+    return lambda: next(it)
+
+def each(func, inputs):
+    """ 全入力についてfunc(入力)を1回ずつ呼ぶ関数を作る """
+    def run():
+        for input in inputs:
+            func(input)
+    return run
+
+def make_dics(dir, size):
+    """ size行の合成パターン辞書とランダム辞書をdirに作る
+
+    キーワード、位置指定や選択を含む正規表現、%match%を含む応答フレーズを
+    混ぜたbenchmarks.gen_dicsの辞書を使う。
+
+    Returns:
+        tuple: (ランダム辞書のパス, パターン辞書のパス)
+    """
+    return gen_dics.write_dics(dir, size)
+
+def sized_benchmarks(size, inputs):
+    """ size行の辞書で計測する項目を作るジェネレーター
+
+    Yields:
+        tuple: (項目名, 引数なしで呼び出す関数)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        random_path, pattern_path = make_dics(tmp, size)
+        yield ('dictionary_load', lambda: dictionary.Dictionary(
+            random_path, pattern_path, snapshot = False))
+        # テキストの辞書を解析してスナップショットを書き出してから計測する
+        dic = dictionary.Dictionary(random_path, pattern_path, snapshot = False)
+        dic.saveSnapshot()
+        assert dic.isSnapshotFresh(), 'snapshot was not written'
+        yield ('dictionary_load_snapshot', lambda: dictionary.Dictionary(
+            random_path, pattern_path))
+        items = dic.pattern
+        next_input = cycle(inputs)
+
+        def match_all():
+            input = next_input()
+            for item in items:
+                item.match(input)
+        yield ('pattern_match', match_all)
+
+        def choice_all():
+            for item in items:
+                item.choice(0)
+        yield ('pattern_choice', choice_all)
+
+        res = responder.PatternResponder('Pattern', dic)
+        yield ('responder_response', each(lambda input: res.response(input, 0), inputs))
+        emotion = yukari.Emotion(dic)
+        yield ('emotion_update', each(emotion.update, inputs))
+
+        def make_lines():
+            for item in items:
+                item.make_line()
+        yield ('make_line', make_lines)
+
+def analyzer_benchmarks(inputs):
+    """ 辞書の大きさによらない形態素解析の項目を作るジェネレーター """
+    analyzer.warm_up()
+    size = analyzer.cache.maxsize
+    analyzer.cache.resize(0)
+    yield ('analyze', each(analyzer.analyze, inputs))
+    analyzer.cache.resize(size)
+    for text in inputs:
+        analyzer.analyze(text)
+    yield ('analyze_cached', each(analyzer.analyze, inputs))
+
+def selected(name, only):
+    """ 項目名がonlyのいずれかで始まればTrue（onlyが空なら常にTrue） """
+    return not only or any(name.startswith(prefix) for prefix in only)
+
+def run_suite(sizes=SIZES, only=(), repeat=REPEAT, target=TARGET, log=None):
+    """ ベンチマークを実行して結果を返す
+
+    Parameters:
+        sizes(intのiterable): 合成辞書の行数。
+        only(strのiterable): 計測する項目名の接頭辞。空ならすべて。
+        repeat(int): 項目ごとの計測の回数。
+        target(float): 1回の計測にかける時間の目安（秒）。
+        log(file): 進捗を書き出すファイル。Noneなら書き出さない。
+
+    Returns:
+        dic: {'meta': 実行環境, 'results': {項目名: measure()の結果}}
+    """
+    inputs = load_inputs()
+    results = {}
+
+    def run(name, func):
+        if not selected(name, only):
+            return
+        results[name] = measure(func, repeat, target)
+        if log is not None:
+            print('{:<34} {:>12.2f} us'.format(name, results[name]['us']),
+                  file = log, flush = True)
+
+    for size in sizes:
+        for name, func in sized_benchmarks(size, inputs):
+            run('{}[{}]'.format(name, size), func)
+    if any(selected(name, only) for name in ('analyze', 'analyze_cached')):
+        for name, func in analyzer_benchmarks(inputs):
+            run(name, func)
+    meta = {'version': VERSION, 'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'sizes': list(sizes),
+            'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--sizes', type = int, nargs = '+', default = list(SIZES),
+                        help = '合成辞書の行数 (default: %(default)s)')
+    parser.add_argument('--only', nargs = '+', default = [],
+                        help = '計測する項目名（接頭辞で指定）')
+    parser.add_argument('--repeat', type = int, default = REPEAT,
+                        help = '項目ごとの計測の回数 (default: %(default)s)')
+    parser.add_argument('--output', help = '結果のJSONを保存するファイル')
+    args = parser.parse_args(argv)
+    # 進捗は標準エラー出力に、結果のJSONは標準出力かファイルに出す
+    suite = run_suite(args.sizes, args.only, args.repeat, log = sys.stderr)
+    text = json.dumps(suite, ensure_ascii = False, indent = 1, sort_keys = True)
+    if args.output:
+        with open(args.output, 'w', encoding = 'utf_8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+import dictionary
+
+# dics/random.txt、dics/pattern.txtを解析して、
+# 起動時に読み込む辞書のスナップショット(dics/dictionary.snapshot)を作る。
+# 辞書ファイルを編集したらもう一度実行する。
+d = dictionary.Dictionary(snapshot = False)
+
+d.saveSnapshot()
+
+print('wrote', d.snapshot_path)
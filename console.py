@@ -0,0 +1,140 @@
+""" 画面を使わずに標準入出力でyukariと対話するコマンド
+
+    python -m yukari                 # 対話モード（REPL）
+    python -m yukari --batch FILE    # FILEの1行を1回の入力として応答を順に出力
+    cat FILE | python -m yukari      # 標準入力が端末でなければバッチモード
+
+PyQt5を読み込まないので、QApplicationを作れない環境（コンテナやパイプライン）でも
+動かせる。辞書はmain.pyと同じく、カレントディレクトリのdics/から読み込む。
+"""
+import argparse
+import os
+import random
+import sys
+import yukari
+from logWriter import TurnLog
+
+# 入力が空のときの応答（MainWindow.buttonTalkSlot()と同じ）
+EMPTY_RESPONSE = 'なに?'
+
+class Console(object):
+    """ 標準入出力でyukariと対話するクラス
+
+    Attributes:
+      yukari (obj:`yukari`): yukariオブジェクトを保持する。
+      action (bool): 応答に使ったResponderの名前を表示するならTrue。
+      output (file): 応答を書き出すファイル。
+      answered (bool): 直前の入力にyukariが応答したならTrue。
+                       入力が空だった場合はFalse。
+    """
+    def __init__(self, action=False, output=sys.stdout, turn_log=None):
+        """ yukariオブジェクトを生成する
+
+        Parameters:
+            action(bool): 応答に使ったResponderの名前を表示するならTrue。
+            output(file): 応答を書き出すファイル。
+            turn_log(TurnLog): 対話の記録を書き込むTurnLog。
+        """
+        self.yukari = yukari.yukari('yukari', turn_log)
+        self.action = action
+        self.output = output
+        self.answered = False
+
+    def prompt(self):
+        """ ピティナのプロンプトを作るメソッド（MainWindow.prompt()と同じ書式）
+
+        直前の入力にyukariが応答した場合だけResponderの名前を付ける。
+        入力が空だった場合は、前の応答のResponderの名前を出さない。
+
+        Returns:
+          str: プロンプトを作る文字列。
+        """
+        p = self.yukari.get_name()
+        if self.action and self.answered:
+            p += '：' + self.yukari.get_responder_name()
+        return p + '> '
+
+    def talk(self, value):
+        """ 1回の入力に対する応答を返す
+
+        Parameters:
+            value(str): ユーザーの入力。
+
+        Returns:
+            str: 応答メッセージ。入力が空の場合はEMPTY_RESPONSE。
+        """
+        self.answered = bool(value)
+        if not value:
+            return EMPTY_RESPONSE
+        return self.yukari.dialogue(value)
+
+    def batch(self, lines, prompt=False):
+        """ 1行を1回の入力として、応答を1行ずつ書き出す
+
+        入力は1行ずつ読み進め、応答は1行ごとにflushするので、
+        パイプラインの後段は入力の終わりを待たずに応答を受け取れる。
+        出力の行数は入力の行数と同じになる。
+
+        Parameters:
+            lines(strのiterable): 入力の行。
+            prompt(bool): 応答の前にプロンプトを付けるならTrue。
+        """
+        for line in lines:
+            response = self.talk(line.rstrip('\r\n'))
+            if prompt:
+                response = self.prompt() + response
+            self.output.write(response + '\n')
+            self.output.flush()
+
+    def repl(self):
+        """ 端末でユーザーと対話する。EOF（Ctrl-D）またはCtrl-Cで終了する。 """
+        while True:
+            try:
+                value = input('> ')
+            except (EOFError, KeyboardInterrupt):
+                self.output.write('\n')
+                return
+            response = self.talk(value)
+            self.output.write(self.prompt() + response + '\n')
+            self.output.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog = 'python -m yukari', description = __doc__.splitlines()[0])
+    parser.add_argument('--batch', metavar = 'FILE',
+                        help = '1行を1回の入力として読み込むファイル（-は標準入力）')
+    parser.add_argument('--responder', action = 'store_true',
+                        help = '応答に使ったResponderの名前を表示する')
+    parser.add_argument('--prompt', action = 'store_true',
+                        help = 'バッチモードでも応答の前にプロンプトを付ける')
+    parser.add_argument('--seed', type = int,
+                        help = '応答の選択に使う乱数のシード')
+    parser.add_argument('--turn-log', metavar = 'FILE',
+                        help = '1ターンごとの記録をJSON Lines形式で追記するファイル')
+    args = parser.parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    turn_log = TurnLog(args.turn_log) if args.turn_log else None
+    console = Console(action = args.responder, turn_log = turn_log)
+    try:
+        if args.batch is None and sys.stdin.isatty():
+            console.repl()
+        elif args.batch in (None, '-'):
+            console.batch(sys.stdin, args.prompt)
+        else:
+            with open(args.batch, 'r', encoding = 'utf_8') as f:
+                console.batch(f, args.prompt)
+    except BrokenPipeError:
+        # headなどの後段が先に終了した場合は、終了時の標準出力のflushで
+        # もう一度BrokenPipeErrorにならないよう、標準出力を/dev/nullにつなぎ替える。
+        # 標準エラー出力はそのまま残す
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    finally:
+        if turn_log is not None:
+            turn_log.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
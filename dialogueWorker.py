@@ -0,0 +1,59 @@
+from PyQt5 import QtCore
+
+class DialogueWorker(QtCore.QObject):
+    """yukari.dialogue()を画面とは別のスレッドで実行するクラス
+
+    MainWindowが専用のQThreadにmoveToThread()して使う。
+    talk()はシグナルのキュー接続で呼ばれるので、入力は受け付けた順に1件ずつ処理され、
+    応答も同じ順にシグナルで画面のスレッドへ返る。
+    yukariオブジェクトはこのスレッドだけが操作する。
+
+    Signals:
+      responded(int, str, str, str, float):
+          (ターン番号, 入力, 応答メッセージ, 応答に使ったResponderの名前, 機嫌値)
+      failed(int, str, str):
+          (ターン番号, 入力, エラーメッセージ)  dialogue()が例外を送出した場合。
+
+    Attributes:
+      yukari (obj:`yukari`): 対話を行うyukariオブジェクト。
+    """
+    responded = QtCore.pyqtSignal(int, str, str, str, float)
+    failed = QtCore.pyqtSignal(int, str, str)
+
+    def __init__(self, yukari):
+        """ 対話に使うyukariオブジェクトを保持する
+
+        Parameters:
+            yukari(yukari): 対話を行うyukariオブジェクト。
+        """
+        super().__init__()
+        self.yukari = yukari
+
+    @QtCore.pyqtSlot(int, str)
+    def talk(self, turn, value):
+        """ 1回の入力に対する応答を作ってシグナルで返す
+
+        応答に使ったResponderの名前と機嫌値もここで取り出して一緒に返す。
+        画面のスレッドが応答を受け取るころには、次の入力の処理が
+        始まっているかもしれないため。
+
+        Parameters:
+            turn(int): MainWindowが入力ごとに振ったターン番号。
+            value(str): ユーザーの入力。
+        """
+        try:
+            response = self.yukari.dialogue(value)
+        except Exception as e:
+            self.failed.emit(turn, value, '{}: {}'.format(type(e).__name__, e))
+            return
+        self.responded.emit(turn, value, response,
+                            self.yukari.get_responder_name(),
+                            float(self.yukari.emotion.mood))
+
+    @QtCore.pyqtSlot()
+    def stop(self):
+        """ スレッドのイベントループを終了する
+
+        キュー接続で呼ばれるので、先に受け付けた入力をすべて処理してから終了する。
+        """
+        QtCore.QThread.currentThread().quit()
@@ -1,15 +1,26 @@
-import random
-import re
+import os
+import pickle
+import struct
+import zlib
+from patternItem import PatternItem
+from matcher import PatternMatcher
+from mappedRandom import MappedRandomList
 
 class Dictionary(object):
     """Dictionaryクラス
     
     ランダム辞書とパターン辞書を開き、データをインスタンス変数に格納する。
 
+    パターン辞書と同じディレクトリに辞書のスナップショット(saveSnapshot()で作る
+    バイナリファイル)があり、両方の辞書ファイルより新しければ、
+    テキストの辞書を解析するかわりにスナップショットを読み込む。
+
     Attributes:
       random (strのlist):
         ランダム辞書のすべてのフレーズを要素として格納。
         [フレーズ1, フレーズ2, フレーズ3, ...]
+        mmap_random=Trueで生成した場合は、ランダム辞書をメモリマップして
+        1行ずつ取り出すMappedRandomList。
                      
       pattern (PatternItemのlist):
         [PatternItem1, PatternItem2, PatternItem3, ...]
@@ -18,32 +29,78 @@ class Dictionary(object):
           "パターン辞書1行"の情報を持つ
           PatternItem.modify(int): 機嫌変動値。
           PatternItem.pattern(str): 正規表現パターン。
+          PatternItem.regex(re.Pattern): コンパイル済みの正規表現パターン。
+          PatternItem.literals(strのtuple): キーワードだけのパターンのキーワード。
+               正規表現として照合が必要なパターンはNone。
+          PatternItem.needs(array), PatternItem.texts(strのlist):
+               応答フレーズごとの必要機嫌値と応答フレーズ。
           PatternItem.phrases(dicのlist):
-               リスト要素の辞書は"応答フレーズ1個"の情報を持つ。
+               needsとtextsから作る"応答フレーズ1個"の情報の辞書のリスト。
                {'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}
                これを1行の応答フレーズグループの数だけ持つ。
+
+      matcher (PatternMatcher):
+        patternのすべての正規表現を束ねて1回の走査で照合するオブジェクト。
+        patternを変更したらrebuildMatcher()で作り直す。
+
+      random_path (str): ランダム辞書ファイルのパス。
+      pattern_path (str): パターン辞書ファイルのパス。
+      snapshot_path (str): スナップショットのパス。
       
     """
-    def __init__(self):
+    RANDOM_PATH = 'dics/random.txt'
+    PATTERN_PATH = 'dics/pattern.txt'
+    # スナップショットのファイル名（パターン辞書と同じディレクトリに置く）
+    SNAPSHOT_NAME = 'dictionary.snapshot'
+    # スナップショットの先頭に書く識別子と形式のバージョン、
+    # パターン辞書の部分のバイト数とCRC32、ランダム辞書の部分のCRC32。
+    # PatternItemの保存内容を変えたらSNAPSHOT_VERSIONを上げる。
+    SNAPSHOT_MAGIC = b'YKRDIC'
+    SNAPSHOT_VERSION = 3
+    SNAPSHOT_HEADER = struct.Struct('<6sHQII')
+
+    def __init__(self, random_path=RANDOM_PATH, pattern_path=PATTERN_PATH,
+                 snapshot=True, mmap_random=False):
         '''Dictionaryオブジェクトの初期化を行う。
         
-        makeRandomList（）、makePatternDictionary()を実行して、
+        新しいスナップショットがあればloadSnapshot()で読み込む。
+        なければmakeRandomList（）、makePatternDictionary()を実行して、
         ランダム応答用のリスト、パターン応答用の辞書オブジェクトを生成する。
+
+        Parameters:
+            random_path(str): ランダム辞書ファイルのパス。
+            pattern_path(str): パターン辞書ファイルのパス。
+            snapshot(bool): Falseならスナップショットを読み込まずに辞書を解析する。
+            mmap_random(bool): Trueならランダム辞書をリストに読み込まず、
+                               メモリマップしたMappedRandomListを使う。
         
         '''
-        # ピティナのランダム辞書を作成。
-        self.random = self.makeRandomList()
-        # ピティナのパターン辞書を作成。
-        self.pattern = self.makePatternDictionary()
+        self.random_path = random_path
+        self.pattern_path = pattern_path
+        self.snapshot_path = os.path.join(
+            os.path.dirname(pattern_path), Dictionary.SNAPSHOT_NAME)
+        self.mmap_random = mmap_random
+        # スナップショットが使えなければテキストの辞書を解析する。
+        if not (snapshot and self.loadSnapshot()):
+            # ピティナのランダム辞書を作成。
+            self.random = self.makeRandomList()
+            # ピティナのパターン辞書を作成。
+            self.pattern = self.makePatternDictionary()
+            # パターン辞書を照合するPatternMatcherを作成。
+            self.rebuildMatcher()
         
     def makeRandomList(self):
         """ランダム辞書ファイルのデータを読み込んでリストrandomに格納する。
         
         Returns:
             strのlist: 要素はランダム辞書1行あたりの応答フレーズ。
+                       mmap_randomがTrueの場合はMappedRandomList。
         """
+        # 大きなランダム辞書はメモリマップして必要な1行だけを読む
+        if self.mmap_random:
+            return MappedRandomList(self.random_path)
         # ランダム辞書ファイルオープン
-        rfile = open('dics/random.txt', 'r', encoding = 'utf_8')
+        rfile = open(self.random_path, 'r', encoding = 'utf_8')
         # 各行を要素としてリストに格納
         r_lines = rfile.readlines()
         rfile.close()
@@ -60,10 +117,11 @@ class Dictionary(object):
         
         Returns:
             PatternItemのlist: PatternItemはパターン辞書1行の応答フレーズ1個の情報を持つ。
+            正規表現パターンはPatternItemの生成時にコンパイルされる。
           
         """        
         # パターン辞書オープン
-        pfile = open('dics/pattern.txt', 'r', encoding = 'utf_8')
+        pfile = open(self.pattern_path, 'r', encoding = 'utf_8')
         # 各行を要素としてリストに格納
         p_lines = pfile.readlines()
         pfile.close()
@@ -86,148 +144,110 @@ class Dictionary(object):
             ptn, prs = line.split('\t')
             patternItemList.append(PatternItem(ptn, prs)) # -----------②
         return patternItemList
-            
-class PatternItem:
-    """パターン辞書1行の情報を保持するクラス
-    
-    Attributes: すべて「パターン辞書1行」あたりのデータ。
-      modify (int): 機嫌変動値。
-      pattern (str): 正規表現パターン。
-      phrases(dicのlist):
-          リスト要素の辞書は"応答フレーズ1個"の情報を持つ。
-          {'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}
-          これを1行の応答フレーズグループの数だけ持つ。
-    """
-    SEPARATOR = '^((-?\d+)##)?(.*)$' # ------------------------①
 
-    def __init__(self, pattern, phrases): # -------------------②
-        """PatternItemの初期化メソッド
-        
-        Parameters:
-            pattern(str): パターン辞書1行の正規表現パターン。
-            phrases(dicのlist）: パターン辞書1行の応答フレーズグループ。
+    def rebuildMatcher(self, automaton=None):
+        """パターン辞書からPatternMatcherを作り直してself.matcherに格納する。
 
-        """        
-        # self.modify、self.patternの初期化。
-        self.initModifyAndPattern(pattern)
-        # self.phrasesの初期化。
-        self.initPhrases(phrases)
+        パターン辞書にPatternItemを追加・削除したときに呼び出す。
 
-    def initModifyAndPattern(self, pattern):
-        """self.modify(int)、self.pattern(str)の初期化を行う。
-        
-        パターン辞書の正規表現パターンの部分にSEPARATORをパターンマッチさせる。、
-        マッチ結果のリストから機嫌変動値と正規表現パターンを取り出し、
-        self.modifyとself.patternに代入する。
-        
         Parameters:
-            pattern(str): パターン辞書1行の正規表現パターン。
-        
+            automaton(LiteralAutomaton): スナップショットから読み込んだオートマトン。
         """
-        # 辞書のパターンの部分にSEPARATORをパターンマッチさせる。
-        m = re.findall(PatternItem.SEPARATOR, pattern) # --------③
-        # 機嫌変動値を保持するインスタンス変数を0で初期化。
-        self.modify = 0 # -------------------------------------④
-        # マッチ結果の整数の部分が空でなければ機嫌変動値をself.modifyに代入。
-        if m[0][1]:
-            self.modify = int(m[0][1]) # -------------------------⑤
-        # マッチ結果からパターン部分を取り出してself.patternに代入。
-        self.pattern = m[0][2] # ------------------------------⑥
-        
-    def initPhrases(self, phrases):
-        """self.phrases(dicのlist)の初期化を行う。
-        
-        パターン辞書の応答フレーズグループにSEPARATORパターンマッチさせる。
-        マッチ結果のリストから"応答フレーズ1個"の必要機嫌値と応答フレーズを取り出して
-          {'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}
-        の辞書を作成。これを応答フレーズグループの数だけ繰り返す。
-        
-        作成した辞書はリストself.phrasesの要素にする。
-        
-        Parameters:
-            phrases(stｒ）: パターン辞書1行の応答フレーズグループ。
-        """
-        # リスト型のインスタンス変数を用意
-        self.phrases = [] # -----------------------------------⑦
-        # dic型のローカル変数
-        dic = {}
-        # 引数で渡された応答フレーズグループを'|'で分割し、
-        # 1個の応答フレーズに対してSEPARATORをパターンマッチさせる。
-        # {'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}を作成し、
-        # リストself.phrasesに格納する。
-        for phrase in phrases.split('|'): # -------------------⑧
-            # 1個の応答フレーズに対してパターンマッチを行う
-            m = re.findall(PatternItem.SEPARATOR, phrase)
-            # 'need'キーの値を必要機嫌値m[0][1]にする
-            # 'phrase'キーの値を応答フレーズm[0][2]にする
-            dic['need'] = 0
-            if m[0][1]:
-                dic['need'] = int(m[0][1])
-            dic['phrase'] = m[0][2]
-            # 作成した辞書をリストphrasesに追加
-            self.phrases.append(dic.copy()) # -----------------⑨
-
-    def match(self, str): # -----------------------------------⑩
-        """ユーザーのメッセージにself.pattern(パターン辞書1行の正規表現パターン)
-           がマッチするかを調べる
-           
-        Parameters:
-            str(stｒ): ユーザーが入力したメッセージ。
-            
-        Returns:
-            Matchオブジェクト、マッチしない場合はNoneを返す。
+        self.matcher = PatternMatcher(self.pattern, automaton = automaton)
 
+    def isSnapshotFresh(self):
+        """スナップショットが両方の辞書ファイルより新しいかを調べる。
+
+        Returns:
+            bool: スナップショットがあり、辞書ファイルより新しければTrue。
         """
-        return re.search(self.pattern, str)
+        try:
+            snapshot = os.stat(self.snapshot_path).st_mtime_ns
+            sources = max(os.stat(self.random_path).st_mtime_ns,
+                          os.stat(self.pattern_path).st_mtime_ns)
+        except OSError:
+            return False
+        return snapshot > sources
 
-    def choice(self, mood): # ---------------------------------⑪
-        """現在の機嫌値と必要機嫌値を比較し、適切な応答フレーズを返す
-        
-        Parameters:
-            mood(int）: ピティナの現在の機嫌値。        
+    def loadSnapshot(self):
+        """スナップショットからランダム辞書とパターン辞書を読み込む。
+
+        スナップショットが古い、形式のバージョンが違う、別の辞書ファイルから
+        作られている、CRC32が合わない、復元できないといった場合は何も読み込まず、
+        テキストの辞書を解析させる。
 
         Returns:
-            str:
-                必要機嫌値をクリアした応答フレーズのリストからランダムチョイスした応答。
-            None:
-                クリアする応答フレーズがない場合はNone。
-                     
+            bool: 読み込めたらTrue。
         """
-        choices = []
-        # self.phrasesが保持する'need''phrase'の辞書を反復処理する
-        for p in self.phrases:
-            # self.phrasesの'need'キーの数値とパラメーターmoodをsuitable()に渡す
-            # 必要機嫌値による条件をクリア（戻り値がTrue）であれば、
-            # 対になっている応答フレーズをchoicesリストに追加する
-            if (self.suitable(p['need'], mood)): # ------------⑫
-                choices.append(p['phrase']) # -----------------⑫
-        # choicesリストが空であればNoneを返す
-        if (len(choices) == 0): # -----------------------------⑭
-            return None
-        # choicesリストからランダムに応答フレーズを抽出して返す
-        return random.choice(choices) # -----------------------⑮
-
-    def suitable(self, need, mood): # -------------------------⑯
-        """現在の機嫌値が必要機嫌値の条件を満たすかを判定
-            
-        Parameters:
-            need(int): 必要機嫌値
-            mood(int): 現在の機嫌値      
+        if not self.isSnapshotFresh():
+            return False
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                header = f.read(Dictionary.SNAPSHOT_HEADER.size)
+                if len(header) != Dictionary.SNAPSHOT_HEADER.size:
+                    return False
+                magic, version, size, data_crc, random_crc = \
+                    Dictionary.SNAPSHOT_HEADER.unpack(header)
+                if (magic, version) != (Dictionary.SNAPSHOT_MAGIC,
+                                        Dictionary.SNAPSHOT_VERSION):
+                    return False
+                payload = f.read(size)
+                if len(payload) != size or zlib.crc32(payload) != data_crc:
+                    return False
+                data = pickle.loads(payload)
+                if data['sources'] != self.snapshotSources():
+                    return False
+                # ランダム辞書は後ろに別に保存してあるので、
+                # メモリマップする場合は読み込まない
+                if self.mmap_random:
+                    random_list = MappedRandomList(self.random_path)
+                else:
+                    payload = f.read()
+                    if zlib.crc32(payload) != random_crc:
+                        return False
+                    random_list = pickle.loads(payload)
+            pattern = data['pattern']
+            automaton = data['automaton']
+        # 壊れたスナップショットの復元ではどんな例外も起こりうる
+        except Exception:
+            return False
+        self.random = random_list
+        self.pattern = pattern
+        self.rebuildMatcher(automaton)
+        return True
 
-        Returns:
-            bool:必要機嫌値をクリアしていたらTrue、そうでなければFalse。
+    def saveSnapshot(self):
+        """ランダム辞書とパターン辞書をスナップショットに書き出す。
 
+        解析済みのPatternItem（必要機嫌値の配列、キーワードかどうかの分類を含む）と
+        キーワードのオートマトンをそのまま保存する。ランダム辞書のリストは、
+        メモリマップする場合に読み飛ばせるよう、その後ろに別に保存する。
+        壊れたスナップショットを読み込まないよう、ヘッダーに両方の部分のCRC32を書く。
+        書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える。
         """
-        # 必要機嫌値が0であればTrueを返す
-        if (need == 0):
-            return True
-        # 必要機嫌値がプラスの場合は機嫌値が必要機嫌値を超えているか判定
-        elif (need > 0):
-            return (mood > need)
-        # 応答例の数値がマイナスの場合は機嫌値が下回っているか判定
-        else:
-            return (mood < need)
+        data = pickle.dumps({'sources': self.snapshotSources(),
+                             'pattern': self.pattern,
+                             'automaton': self.matcher.automaton},
+                            protocol = pickle.HIGHEST_PROTOCOL)
+        random_data = pickle.dumps(list(self.random), protocol = pickle.HIGHEST_PROTOCOL)
+        tmp = self.snapshot_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(Dictionary.SNAPSHOT_HEADER.pack(
+                Dictionary.SNAPSHOT_MAGIC, Dictionary.SNAPSHOT_VERSION,
+                len(data), zlib.crc32(data), zlib.crc32(random_data)))
+            f.write(data)
+            f.write(random_data)
+        os.replace(tmp, self.snapshot_path)
 
+    def snapshotSources(self):
+        """スナップショットの元になる辞書ファイルのパスを返す。
+
+        Returns:
+            tuple: (ランダム辞書の絶対パス, パターン辞書の絶対パス)
+        """
+        return (os.path.abspath(self.random_path),
+                os.path.abspath(self.pattern_path))
+            
 
 #### 以下、変数確認用のコード ####
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+import gzip
+import json
+import lzma
+import os
+import re
+import shutil
+import time
+
+class LogArchive(object):
+    """対話ログのローテーションと、圧縮した古いログの読み出しを行うクラス
+
+    ログファイル（dics/log.txt）が大きくなるか古くなったら、まとめて圧縮して
+    ログファイルと同じ場所のlogs/ディレクトリにセグメントとして移し、
+    ログファイルを空にする。ローテーションは対話を始める前（LogWriterを開く前）に
+    行うので、1つの対話のログが2つのセグメントに分かれることはない。
+
+    logs/index.jsonには古い順にセグメントの一覧を記録する。
+      name: セグメントのファイル名
+      since, until: セグメントのログを書き込んだ期間（UNIX時刻）
+      first, last: 最初と最後の対話のログタイトルの日時
+      sessions, lines, size: 対話の数、行数、圧縮前のバイト数
+
+    lastSessions()は索引の対話の数を使って、新しいほうから必要なセグメントだけを読む。
+
+    Attributes:
+      path (str): ログファイルのパス。
+      dir (str): セグメントと索引を置くディレクトリ。
+      index_path (str): 索引ファイルのパス。
+      max_bytes (int): ログファイルをローテーションする大きさ。
+      max_age (float): ログファイルをローテーションするまでの秒数。
+      compression (str): セグメントの圧縮形式（'gzip'または'lzma'）。
+    """
+    MAX_BYTES = 1024 * 1024
+    MAX_AGE = 30 * 24 * 60 * 60
+    COMPRESSION = 'gzip'
+    # 圧縮形式ごとのファイルの拡張子とopen関数
+    COMPRESSORS = {'gzip': ('.gz', gzip.open), 'lzma': ('.xz', lzma.open)}
+    INDEX_NAME = 'index.json'
+    INDEX_VERSION = 1
+    # 対話の始まりを示すログタイトルの行
+    TITLE = re.compile('^Yukari System Dialogue Log: (.*)$')
+
+    def __init__(self, path, max_bytes=MAX_BYTES, max_age=MAX_AGE,
+                 compression=COMPRESSION):
+        """
+        Parameters:
+            path(str): ログファイルのパス。
+            max_bytes(int): ログファイルをローテーションする大きさ。
+            max_age(float): ログファイルをローテーションするまでの秒数。
+            compression(str): セグメントの圧縮形式（'gzip'または'lzma'）。
+        """
+        if compression not in LogArchive.COMPRESSORS:
+            raise ValueError('unknown compression: {}'.format(compression))
+        self.path = path
+        self.dir = os.path.join(os.path.dirname(path), 'logs')
+        self.index_path = os.path.join(self.dir, LogArchive.INDEX_NAME)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compression = compression
+
+    def loadIndex(self):
+        """ 索引を読み込む
+
+        Returns:
+            dic: {'version': 形式のバージョン,
+                  'since': ログファイルに書き込み始めた時刻（UNIX時刻、不明ならNone）,
+                  'segments': セグメントの情報のlist（古い順）}
+        """
+        try:
+            with open(self.index_path, 'r', encoding = 'utf_8') as f:
+                index = json.load(f)
+            if index.get('version') == LogArchive.INDEX_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+        return {'version': LogArchive.INDEX_VERSION, 'since': None, 'segments': []}
+
+    def saveIndex(self, index):
+        """ 索引を一時ファイルに書いてから置き換える
+
+        Parameters:
+            index(dic): loadIndex()と同じ形式の索引。
+        """
+        os.makedirs(self.dir, exist_ok = True)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding = 'utf_8') as f:
+            json.dump(index, f, ensure_ascii = False, indent = 1)
+        os.replace(tmp, self.index_path)
+
+    def needsRotation(self, index, now):
+        """ ログファイルをローテーションするかを判定する
+
+        Parameters:
+            index(dic): 索引。
+            now(float): 現在の時刻（UNIX時刻）。
+
+        Returns:
+            bool: max_bytes以上の大きさか、max_ageより古ければTrue。
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if size == 0:
+            return False
+        if size >= self.max_bytes:
+            return True
+        return index['since'] is not None and now - index['since'] >= self.max_age
+
+    def rotate(self, now=None):
+        """ 必要であればログファイルを圧縮してセグメントにし、ログファイルを空にする
+
+        LogWriterでログファイルを開く前に呼ぶ。
+
+        Parameters:
+            now(float): 現在の時刻（UNIX時刻）。省略すると現在時刻。
+
+        Returns:
+            str: 作ったセグメントのパス。ローテーションしなかった場合はNone。
+        """
+        if now is None:
+            now = time.time()
+        index = self.loadIndex()
+        if not self.needsRotation(index, now):
+            # 書き込み始めた時刻が分からなければ今から数える
+            if index['since'] is None and os.path.exists(self.path):
+                index['since'] = now
+                self.saveIndex(index)
+            return None
+        stats = self.scan(self.path)
+        ext, opener = LogArchive.COMPRESSORS[self.compression]
+        name = 'log-{}{}'.format(time.strftime('%Y%m%d-%H%M%S', time.localtime(now)), ext)
+        # 同じ秒に2回ローテーションした場合も上書きしない
+        n = 1
+        while os.path.exists(os.path.join(self.dir, name)):
+            n += 1
+            name = 'log-{}-{}{}'.format(
+                time.strftime('%Y%m%d-%H%M%S', time.localtime(now)), n, ext)
+        os.makedirs(self.dir, exist_ok = True)
+        segment = os.path.join(self.dir, name)
+        tmp = segment + '.tmp'
+        with open(self.path, 'rb') as src, opener(tmp, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, segment)
+        since = index['since']
+        if since is None:
+            since = os.path.getmtime(self.path)
+        stats.update({'name': name, 'since': since, 'until': now})
+        index['segments'].append(stats)
+        index['since'] = now
+        self.saveIndex(index)
+        # セグメントと索引を書いてからログファイルを空にする
+        open(self.path, 'w').close()
+        return segment
+
+    def scan(self, path):
+        """ ログファイルの対話の数、行数、最初と最後のログタイトルの日時を数える
+
+        Parameters:
+            path(str): ログファイルのパス。
+
+        Returns:
+            dic: {'first', 'last', 'sessions', 'lines', 'size'}
+        """
+        stats = {'first': None, 'last': None, 'sessions': 0, 'lines': 0,
+                 'size': os.path.getsize(path)}
+        with open(path, 'r', encoding = 'utf_8', errors = 'replace') as f:
+            for line in f:
+                stats['lines'] += 1
+                m = LogArchive.TITLE.match(line.rstrip('\r\n'))
+                if m:
+                    stats['sessions'] += 1
+                    if stats['first'] is None:
+                        stats['first'] = m.group(1)
+                    stats['last'] = m.group(1)
+        return stats
+
+    def segments(self):
+        """ セグメントのパスを新しい順に返す
+
+        Returns:
+            strのlist: セグメントのパス。
+        """
+        return [os.path.join(self.dir, segment['name'])
+                for segment in reversed(self.loadIndex()['segments'])]
+
+    def readSegment(self, path):
+        """ セグメントを展開して行のリストを返す
+
+        Parameters:
+            path(str): セグメントのパス。
+
+        Returns:
+            strのlist: セグメントの行（末尾の改行は取り除く）。
+        """
+        opener = gzip.open if path.endswith('.gz') else lzma.open
+        with opener(path, 'rt', encoding = 'utf_8', errors = 'replace') as f:
+            return [line.rstrip('\r\n') for line in f]
+
+    def readLines(self, path):
+        """ ログファイルの行のリストを返す。ファイルがなければ空のリスト。 """
+        try:
+            with open(path, 'r', encoding = 'utf_8', errors = 'replace') as f:
+                return [line.rstrip('\r\n') for line in f]
+        except OSError:
+            return []
+
+    def lastSessions(self, n):
+        """ 新しいほうからn個の対話のログを返す
+
+        ログファイルから読み、足りなければ新しいセグメントから順に、
+        索引の対話の数で必要なぶんだけ展開する。
+
+        Parameters:
+            n(int): 取り出す対話の数。
+
+        Returns:
+            tupleのlist: (ログタイトルの行, 対話の行のlist)を古い順に並べたもの。
+                         ログタイトルより前の行はログタイトルをNoneとする。
+        """
+        sessions = self.split(self.readLines(self.path))
+        for segment in reversed(self.loadIndex()['segments']):
+            if len(sessions) >= n:
+                break
+            path = os.path.join(self.dir, segment['name'])
+            sessions = self.split(self.readSegment(path)) + sessions
+        return sessions[-n:] if n > 0 else []
+
+    def split(self, lines):
+        """ ログの行を対話ごとに分ける
+
+        Parameters:
+            lines(strのlist): ログの行。
+
+        Returns:
+            tupleのlist: (ログタイトルの行, 対話の行のlist)
+        """
+        sessions = []
+        for line in lines:
+            if not line:
+                continue
+            if LogArchive.TITLE.match(line) or not sessions:
+                title = line if LogArchive.TITLE.match(line) else None
+                sessions.append((title, [] if title else [line]))
+            else:
+                sessions[-1][1].append(line)
+        return sessions
@@ -0,0 +1,236 @@
+import os
+from collections import deque
+from PyQt5 import QtCore
+
+class LogReader(object):
+    """ログファイルを末尾から1ブロックずつさかのぼって読むクラス
+
+    ファイルの末尾を起点に、古い行が必要になったぶんだけ読み込む。
+    読み込んだ行は新しい順にlinesに保持する。
+    ファイルに行が追記されて大きさが変わったら、末尾から読み直す。
+    ファイルの先頭まで読んだら、LogArchiveのセグメントを新しい順に読む。
+
+    Attributes:
+      path (str): ログファイルのパス。
+      archive (LogArchive): ローテーションしたセグメントを読むLogArchive。
+      lines (strのlist): 読み込んだ行。lines[0]が最も新しい行。
+    """
+    # 1回に読み込むバイト数
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, path, archive=None):
+        """
+        Parameters:
+            path(str): ログファイルのパス。ファイルがなくてもよい。
+            archive(LogArchive): pathのセグメントを読むLogArchive。
+        """
+        self.path = path
+        self.archive = archive
+        self.reset(self.getSize())
+
+    def getSize(self):
+        """ ログファイルの大きさを返す。ファイルがなければ0。 """
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def reset(self, size):
+        """ 読み込んだ行を捨て、大きさsizeのファイルの末尾から読み直す準備をする
+
+        Parameters:
+            size(int): ログファイルの大きさ。
+        """
+        self.size = size
+        self.lines = []
+        # まだ読んでいない部分の末尾の位置と、行の途中で切れた読み残し
+        self.pos = size
+        self.rest = b''
+        # まだ読んでいないセグメント（新しい順）
+        self.segments = None
+
+    def get(self, age, count):
+        """ 新しいほうからage行目以降のcount行を返す
+
+        Parameters:
+            age(int): 最も新しい行を0とした行の位置。
+            count(int): 取り出す行数。
+
+        Returns:
+            strのlist: 取り出した行（ファイルの並び順）。
+                       ファイルの先頭に達した場合はcount行より少ない。
+        """
+        # 追記された行があると位置がずれるので読み直す
+        size = self.getSize()
+        if size != self.size:
+            self.reset(size)
+        while len(self.lines) < age + count:
+            if self.pos > 0:
+                self.readBlock()
+            elif not self.readSegment():
+                break
+        return self.lines[age:age + count][::-1]
+
+    def readSegment(self):
+        """ まだ読んでいないセグメントのうち最も新しいものを読み、linesに追加する
+
+        Returns:
+            bool: セグメントを読んだらTrue、残っていなければFalse。
+        """
+        if self.archive is None:
+            return False
+        if self.segments is None:
+            self.segments = self.archive.segments()
+        if not self.segments:
+            return False
+        lines = self.archive.readSegment(self.segments.pop(0))
+        self.lines.extend(line for line in reversed(lines) if line)
+        return True
+
+    def readBlock(self):
+        """ 読んでいない部分の末尾から1ブロックを読み、行に分けてlinesに追加する """
+        start = max(0, self.pos - LogReader.BLOCK_SIZE)
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                data = f.read(self.pos - start) + self.rest
+        except OSError:
+            self.pos = 0
+            return
+        parts = data.split(b'\n')
+        # ブロックの先頭の行は途中で切れているかもしれないので次のブロックに回す
+        self.rest = b''
+        if start > 0:
+            self.rest = parts.pop(0)
+        self.pos = start
+        for part in reversed(parts):
+            line = part.rstrip(b'\r')
+            if line:
+                self.lines.append(line.decode('utf_8', 'replace'))
+
+class LogHistory(object):
+    """ログの行を新しいほうからの位置で取り出すクラス
+
+    現在の対話の行もLogWriterでログファイルに書き込まれるので、
+    LogWriterのバッファを書き出してからログファイルを読む。
+
+    Attributes:
+      writer (LogWriter): 現在の対話のログを書き込んでいるLogWriter。
+      reader (LogReader): ログファイルを読むLogReader。
+    """
+    def __init__(self, path, writer=None, archive=None):
+        """
+        Parameters:
+            path(str): ログファイルのパス。
+            writer(LogWriter): pathに書き込んでいるLogWriter。
+            archive(LogArchive): pathのセグメントを読むLogArchive。
+        """
+        self.writer = writer
+        self.reader = LogReader(path, archive)
+
+    def get(self, age, count):
+        """ 新しいほうからage行目以降のcount行を返す
+
+        Parameters:
+            age(int): 最も新しい行を0とした行の位置。
+            count(int): 取り出す行数。
+
+        Returns:
+            strのlist: 取り出した行（ログの並び順）。
+        """
+        if self.writer is not None:
+            self.writer.flush()
+        return self.reader.get(age, count)
+
+class LogModel(QtCore.QAbstractListModel):
+    """対話ログを表示するQListView用のモデル
+
+    メモリに持つのは最新の行から連続するrowsだけで、ふだんはcapacity行、
+    古い行をさかのぼって表示している間もlimit行を上限とする。
+    上限を超えた古い行は捨て、必要になったらLogHistoryから読み直す。
+
+    Attributes:
+      history (LogHistory): 古い行を取り出すLogHistory。
+      rows (deque): 表示している行。末尾が最も新しい行。
+      capacity (int): ふだんメモリに持つ行数。
+      page_size (int): 古い行を1回に読み込む行数。
+      limit (int): さかのぼって表示する場合も含めた最大の行数。
+      paged (bool): capacityを超えて古い行を読み込んでいる間はTrue。
+    """
+    CAPACITY = 500
+    PAGE_SIZE = 100
+    LIMIT = 5000
+
+    def __init__(self, history, capacity=CAPACITY, page_size=PAGE_SIZE,
+                 limit=LIMIT, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.rows = deque()
+        self.capacity = capacity
+        self.page_size = page_size
+        self.limit = max(limit, capacity)
+        self.paged = False
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """ 表示している行数を返す（QAbstractListModelのオーバーライド） """
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """ 行の文字列を返す（QAbstractListModelのオーバーライド） """
+        if role == QtCore.Qt.DisplayRole and index.isValid():
+            return self.rows[index.row()]
+        return None
+
+    def append(self, line):
+        """ 最新の行を末尾に追加し、上限を超えたぶんの古い行を捨てる
+
+        Parameters:
+            line(str): ログの1行。
+        """
+        n = len(self.rows)
+        self.beginInsertRows(QtCore.QModelIndex(), n, n)
+        self.rows.append(line)
+        self.endInsertRows()
+        self.trim(self.limit if self.paged else self.capacity)
+
+    def fetchOlder(self):
+        """ 表示している行より古い行を1ページぶん先頭に追加する
+
+        Returns:
+            int: 追加した行数。limitに達しているか、古い行がなければ0。
+        """
+        count = min(self.page_size, self.limit - len(self.rows))
+        if count <= 0:
+            return 0
+        lines = self.history.get(len(self.rows), count)
+        if not lines:
+            return 0
+        self.beginInsertRows(QtCore.QModelIndex(), 0, len(lines) - 1)
+        self.rows.extendleft(reversed(lines))
+        self.endInsertRows()
+        self.paged = len(self.rows) > self.capacity
+        return len(lines)
+
+    def release(self):
+        """ さかのぼって読み込んだ古い行を捨て、capacity行に戻す
+
+        最新の行までスクロールが戻ったときに呼ぶ。
+        """
+        self.trim(self.capacity)
+        self.paged = False
+
+    def trim(self, size):
+        """ 行数がsizeを超えていれば先頭の古い行を捨てる
+
+        Parameters:
+            size(int): 残す行数。
+        """
+        extra = len(self.rows) - size
+        if extra <= 0:
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), 0, extra - 1)
+        for _ in range(extra):
+            self.rows.popleft()
+        self.endRemoveRows()
@@ -0,0 +1,118 @@
+import atexit
+import json
+import os
+import threading
+
+class LogWriter(object):
+    """対話ログをバッファに貯めて、別スレッドで少しずつファイルに書き込むクラス
+
+    write()は文字列をバッファに追加するだけで、ファイルへの書き込みは
+    バックグラウンドのスレッドが行う。バッファの大きさがbuffer_sizeに達するか、
+    最後の書き込みからinterval秒たつとバッファの内容をファイルに書き出す。
+    メモリに持つのは書き出す前のバッファだけになる。
+
+    close()はバッファの残りを書き出し、os.fsync()でディスクへの書き込みを
+    完了してからファイルを閉じる。close()を呼ばずにプログラムが終了した場合も
+    atexitで同じ処理を行う。
+
+    Attributes:
+      path (str): ログファイルのパス。
+      buffer_size (int): バッファを書き出す文字数の目安。
+      interval (float): バッファを書き出す間隔（秒）。
+    """
+    BUFFER_SIZE = 64 * 1024
+    INTERVAL = 1.0
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE, interval=INTERVAL):
+        """ ログファイルを追記モードで開き、書き込み用のスレッドを開始する
+
+        Parameters:
+            path(str): ログファイルのパス。
+            buffer_size(int): バッファを書き出す文字数の目安。
+            interval(float): バッファを書き出す間隔（秒）。
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.interval = interval
+        self.buffer = []
+        self.size = 0
+        self.closed = False
+        # bufferを守るロックと、ファイルへの書き込みの順序を守るロック
+        self.cond = threading.Condition()
+        self.io_lock = threading.Lock()
+        self.file = open(path, 'a', encoding = 'utf_8')
+        self.thread = threading.Thread(
+            target = self.run, name = 'LogWriter', daemon = True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, text):
+        """ 文字列をバッファに追加する
+
+        Parameters:
+            text(str): ログに書き込む文字列（改行を含める）。
+        """
+        with self.cond:
+            if self.closed:
+                raise ValueError('LogWriter is closed')
+            self.buffer.append(text)
+            self.size += len(text)
+            if self.size >= self.buffer_size:
+                self.cond.notify()
+
+    def flush(self):
+        """ バッファの内容をファイルに書き出す
+
+        書き出した内容はOSに渡るので、プログラムが異常終了しても失われない。
+        """
+        with self.io_lock:
+            with self.cond:
+                data = ''.join(self.buffer)
+                self.buffer = []
+                self.size = 0
+            if data:
+                self.file.write(data)
+                self.file.flush()
+
+    def run(self):
+        """ 書き込み用のスレッドで実行する処理
+
+        バッファがbuffer_sizeに達するか、interval秒たつたびにflush()する。
+        """
+        while True:
+            with self.cond:
+                self.cond.wait_for(
+                    lambda: self.closed or self.size >= self.buffer_size,
+                    self.interval)
+                closed = self.closed
+            self.flush()
+            if closed:
+                return
+
+    def close(self):
+        """ バッファの残りを書き出してディスクに同期し、ファイルを閉じる """
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        atexit.unregister(self.close)
+
+class TurnLog(LogWriter):
+    """1ターンの記録を1行のJSONとして書き込むLogWriter
+
+    yukari.dialogue()が作るターンの記録（yukari.last_turn）を
+    JSON Lines形式でファイルに追記する。書き込みはLogWriterと同じく
+    バッファに貯めてバックグラウンドのスレッドが行う。
+    """
+    def writeTurn(self, record):
+        """ ターンの記録を1行のJSONにしてバッファに追加する
+
+        Parameters:
+            record(dic): yukari.last_turnと同じ形式のターンの記録。
+        """
+        self.write(json.dumps(record, ensure_ascii = False) + '\n')
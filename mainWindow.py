@@ -1,8 +1,13 @@
 import datetime # ----------------------------------------------------------①
+from PyQt5 import QtCore
 from PyQt5 import QtWidgets
 from PyQt5 import QtGui # ---------------------------------------------------①
 import Yuzuki_YukariUI
 import yukari
+from dialogueWorker import DialogueWorker
+from logArchive import LogArchive
+from logModel import LogHistory, LogModel
+from logWriter import LogWriter, TurnLog
 
 class MainWindow(QtWidgets.QMainWindow):    
     """MainWindowクラス
@@ -14,8 +19,32 @@ class MainWindow(QtWidgets.QMainWindow):
       action (bool): ラジオボタンの状態を保持する。
       yukari (obj:`yukari`): yukariオブジェクトを保持する。
       ui (obj:`Ui_MainWindow`): Ui_MainWindowオブジェクトを保持する。      
+      workerThread (obj:`QThread`): 対話を実行するスレッド。
+      worker (obj:`DialogueWorker`): workerThreadでyukari.dialogue()を実行する。
+      turn (int): 最後に受け付けた入力のターン番号。
+      answered (int): 最後に応答（または失敗）を受け取った入力のターン番号。
+                      turnとの差が応答を待っている入力の数になる。
+      responder_name (str): 最後の応答に使ったResponderの名前。
+      mood (float): 最後の応答を返したときの機嫌値。
+      looks (str): labelShowImgに表示している表情の画像のパス。
+      pixmaps (dic): {表情の画像のパス: デコード済みのQPixmap}
+      logArchive (obj:`LogArchive`): ログファイルのローテーションを行うLogArchive。
+      logWriter (obj:`LogWriter`): 対話ログをログファイルに書き込むLogWriter。
+      turnLog (obj:`TurnLog`): 1ターンごとの記録を書き込むTurnLog。
+                               TURN_LOG_PATHがNoneならNone。
+      logModel (obj:`LogModel`): listViewLogに表示する対話ログのモデル。
       
     """
+    # 対話ログを保存するファイル
+    LOG_PATH = 'dics/log.txt'
+    # 1ターンごとの記録（JSON Lines形式）を保存するファイル。
+    # 'dics/turns.jsonl'などを指定すると記録を始める
+    TURN_LOG_PATH = None
+
+    # 入力をDialogueWorkerに渡すシグナル（ターン番号, 入力）
+    requested = QtCore.pyqtSignal(int, str)
+    # DialogueWorkerのスレッドを終了させるシグナル
+    stopping = QtCore.pyqtSignal()
         
     def __init__(self):
         """初期化のための処理を行う
@@ -27,12 +56,51 @@ class MainWindow(QtWidgets.QMainWindow):
         
         """
         super().__init__()
-        self.yukari = yukari.yukari('yukari') # yukariオブジェクトを生成。
+        self.turnLog = None
+        if MainWindow.TURN_LOG_PATH:
+            self.turnLog = TurnLog(MainWindow.TURN_LOG_PATH)
+        self.yukari = yukari.yukari('yukari', self.turnLog) # yukariオブジェクトを生成。
         self.action = True                    # ラジオボタンの状態を初期化。
         self.ui = Yuzuki_YukariUI.Ui_MainWindow() # Ui_MainWindowオブジェクトを生成。
-        self.log = []                         # ログ用のリストを用意。------------②
+        # ログファイルが大きいか古ければ、書き込み始める前に圧縮して移す
+        self.logArchive = LogArchive(MainWindow.LOG_PATH)
+        self.logArchive.rotate()
+        # ログは対話の途中からLogWriterでログファイルに書き込む。--------------②
+        # ログタイトルと対話を始めた日時を最初に書き込む
+        self.logWriter = LogWriter(MainWindow.LOG_PATH)
+        self.logWriter.write(self.logTitle())
         # setupUi()で画面を構築。MainWindow自身を引数にすることが必要。
         self.ui.setupUi(self)
+        # 応答に時間がかかっても画面が止まらないよう、
+        # 対話は専用のスレッドで実行して結果をシグナルで受け取る
+        self.turn = 0
+        self.answered = 0
+        self.responder_name = ''
+        self.mood = 0.0
+        self.workerThread = QtCore.QThread(self)
+        self.worker = DialogueWorker(self.yukari)
+        self.worker.moveToThread(self.workerThread)
+        # スレッドをまたぐシグナルはキュー接続になるので、
+        # 応答より速く入力されても受け付けた順に1件ずつ処理される
+        self.requested.connect(self.worker.talk)
+        self.stopping.connect(self.worker.stop)
+        self.worker.responded.connect(self.responseSlot)
+        self.worker.failed.connect(self.failedSlot)
+        self.workerThread.start()
+        # 表情の画像は初めて使うときに1度だけデコードして使い回す。
+        # setupUi()はデフォルトの表情を表示している
+        self.looks = ':/re/img/talk.gif'
+        self.pixmaps = {}
+        # 対話ログは最新の行だけをメモリに持ち、
+        # 上端までスクロールしたら古い行をログファイルから読み込む
+        self.logModel = LogModel(
+            LogHistory(MainWindow.LOG_PATH, self.logWriter, self.logArchive),
+            parent = self)
+        self.ui.listViewLog.setModel(self.logModel)
+        self.ui.listViewLog.verticalScrollBar().valueChanged.connect(
+            self.logScrolled)
+        # 行が少なくてスクロールできないときは、上向きのホイールで読み込む
+        self.ui.listViewLog.viewport().installEventFilter(self)
         
     def putlog(self, str):
         """ 対話ログをリストに追加するメソッド。
@@ -40,10 +108,45 @@ class MainWindow(QtWidgets.QMainWindow):
         Parameters:
           str(str): ユーザーの入力または応答メッセージをログ用に整形した文字列。       
         """
-        # QListWidgetクラスのaddItem()でログをリストに追加する。
-        self.ui.listWidgetLog.addItem(str)
-        # ユーザーからのメッセージ、ピティナの応答に改行を付けてlogに追加
-        self.log.append(str + '\n') # --------------------------------------③
+        # LogModelのappend()でログをリストに追加する。
+        self.logModel.append(str)
+        # ユーザーからのメッセージ、ピティナの応答に改行を付けてログファイルに書き込む
+        self.logWriter.write(str + '\n') # ---------------------------------③
+    def logScrolled(self, value):
+        """ listViewLogがスクロールされたときに呼ばれるイベントハンドラー
+
+        上端に達したら古いログを読み込み、下端に戻ったら読み込んだ古いログを捨てる。
+
+        Parameters:
+          value(int): スクロールバーの位置。
+        """
+        bar = self.ui.listViewLog.verticalScrollBar()
+        if value == bar.minimum():
+            self.loadOlderLog()
+        elif value == bar.maximum() and self.logModel.paged:
+            self.logModel.release()
+
+    def loadOlderLog(self):
+        """ 古いログを1ページぶん読み込み、表示していた行が動かないようにする """
+        count = self.logModel.fetchOlder()
+        if count:
+            self.ui.listViewLog.scrollTo(
+                self.logModel.index(count, 0),
+                QtWidgets.QAbstractItemView.PositionAtTop)
+
+    def eventFilter(self, obj, event):
+        """ listViewLogのホイール操作を監視する（QObjectのオーバーライド）
+
+        スクロールバーが上端にあるときの上向きのホイールで古いログを読み込む。
+        """
+        if (obj is self.ui.listViewLog.viewport()
+                and event.type() == QtCore.QEvent.Wheel
+                and event.angleDelta().y() > 0):
+            bar = self.ui.listViewLog.verticalScrollBar()
+            if bar.value() == bar.minimum():
+                self.loadOlderLog()
+        return super().eventFilter(obj, event)
+
     def prompt(self):
         """ ピティナのプロンプトを作るメソッド。
         
@@ -53,8 +156,9 @@ class MainWindow(QtWidgets.QMainWindow):
         # yukariクラスのget_name()でオブジェクト名を取得
         p = self.yukari.get_name()
         # 「Responderを表示」がオンならオブジェクト名を付加する
+        # Responderの名前は応答と一緒に受け取ったものを使う
         if self.action == True:
-            p += '：' + self.yukari.get_responder_name()
+            p += '：' + self.responder_name
             
         # プロンプト記号を付けて返す
         return p + '> '
@@ -62,44 +166,83 @@ class MainWindow(QtWidgets.QMainWindow):
     def change_looks(self): # -----------------------------------------------②
         """機嫌値によってピティナの表情を切り替えるメソッド
         
+        表情が変わったときだけlabelShowImgの画像を差し替える。
+        画像はpixmap()でデコード済みのものを使う。
+        """
+        # 最後の応答を返したときのピティナの機嫌値に合う表情を調べる
+        looks = self.expression(self.mood)
+        # どの表情にも当てはまらない、または表情が変わらなければそのままにする
+        if looks is None or looks == self.looks:
+            return
+        self.ui.labelShowImg.setPixmap(self.pixmap(looks))
+        self.looks = looks
+
+    def expression(self, em):
+        """機嫌値に合う表情の画像のパスを返す
+
+        Parameters:
+          em(float): ピティナの機嫌値。
+
+        Returns:
+          str: 表情の画像のパス。どの表情にも当てはまらない場合はNone。
         """
-        # 応答フレーズを返す直前のピティナの機嫌値を取得
-        em = self.yukari.emotion.mood
         # デフォルトの表情
         if -2 <= em < 1.5:
-            self.ui.labelShowImg.setPixmap(QtGui.QPixmap(":/re/img/talk.gif"))
+            return ":/re/img/talk.gif"
         # ちょっと不機嫌な表情
         elif -5 <= em < -2:
-            self.ui.labelShowImg.setPixmap(QtGui.QPixmap(":/re/img/empty.gif"))
+            return ":/re/img/empty.gif"
         # 怒った表情
         elif -10 <= em < -5:
-            self.ui.labelShowImg.setPixmap(QtGui.QPixmap(":/re/img/angry.gif"))
+            return ":/re/img/angry.gif"
         # 嬉しさ爆発の表情
         elif 1.5 <= em <= 15:
-            self.ui.labelShowImg.setPixmap(QtGui.QPixmap(":/re/img/happy.gif"))
+            return ":/re/img/happy.gif"
+        return None
+
+    def pixmap(self, looks):
+        """表情の画像をデコードしたQPixmapを返す
+
+        画像ごとに初めて呼ばれたときにリソースからデコードし、以降は同じものを返す。
+
+        Parameters:
+          looks(str): 表情の画像のパス。
+
+        Returns:
+          QPixmap: デコード済みの画像。
+        """
+        pixmap = self.pixmaps.get(looks)
+        if pixmap is None:
+            pixmap = QtGui.QPixmap(looks)
+            self.pixmaps[looks] = pixmap
+        return pixmap
 
       
+    def logTitle(self):
+        """ ログタイトルと対話を始めた日時のテキストを作る
+
+        Returns:
+          str: ログファイルに書き込むログタイトルの行。
+        """
+        # 日時は2020-01-01 00:00::00の書式にする
+        return 'Yukari System Dialogue Log: '\
+               + datetime.datetime.now().strftime('%Y-%m-%d %H:%m::%S')\
+               + '\n'
+
     def writeLog(self): # --------------------------------------------------④
-        """ ログを更新日時と共にログファイルに書き込む
+        """ ログファイルへの書き込みを完了する
         
+        LogWriterのバッファに残ったログを書き込み、ディスクに同期して閉じる。
         """
-        # ログタイトルと更新日時のテキストを作成 
-        # 日時は2020-01-01 00:00::00の書式にする
-        now = 'Yukari System Dialogue Log: '\
-              + datetime.datetime.now().strftime('%Y-%m-%d %H:%m::%S')\
-              + '\n'
-                      
-        # リストlogの先頭要素として更新日時を追加
-        self.log.insert(0, now)
-        # logのすべての要素をログファイルへに書き込む
-        with open('dics/log.txt', 'a', encoding = 'utf_8') as f:
-            f.writelines(self.log)        
+        self.logWriter.close()
+        if self.turnLog is not None:
+            self.turnLog.close()
 
     def buttonTalkSlot(self):
         """ [話す]ボタンのイベントハンドラー
         
-        ・yukariクラスのdialogue()を実行して応答メッセージを取得
-        ・入力文字列および応答メッセージをログに出力
+        ・入力文字列をシグナルでDialogueWorkerに渡す
+        ・応答メッセージはresponseSlot()で受け取る
         
         """
         # ラインエディットのテキストを取得
@@ -108,21 +251,88 @@ class MainWindow(QtWidgets.QMainWindow):
         if not value:
             # 入力エリアが未入力の場合は「なに?」と表示。
             self.ui.labelResponce.setText('なに?')
+            # ピティナのイメージを現在の機嫌値に合わせる
+            self.change_looks() # -------------------------------------------③
         else:
-            # 入力されていたら対話オブジェクトを実行
-            # インプット文字列を引数にしてdialogue()を実行し、応答メッセージを取得
-            response = self.yukari.dialogue(value)
-            # ピティナの応答メッセージをラベルに出力
-            self.ui.labelResponce.setText(response)
-            # プロンプト記号にインプット文字列を連結してログ用のリストに出力
-            self.putlog('> ' + value)
-            # ピティナ専用のプロンプト記号に応答メッセージを連結してログ用のリストに出力
-            self.putlog(self.prompt() + response)
+            # 入力されていたらターン番号を振ってDialogueWorkerに渡す。
+            # 前の応答を待たずに次の入力を受け付ける
+            self.turn += 1
+            self.requested.emit(self.turn, value)
+            self.showPending()
             # QLineEditクラスのclear()メソッドでラインエディットのテキストをクリア
             self.ui.lineEdit.clear()
-            
+
+    @QtCore.pyqtSlot(int, str, str, str, float)
+    def responseSlot(self, turn, value, response, name, mood):
+        """ DialogueWorkerから応答を受け取ったときに呼ばれるイベントハンドラー
+
+        ・応答メッセージをラベルに出力
+        ・入力文字列および応答メッセージをログに出力
+
+        Parameters:
+          turn(int): 入力のターン番号。
+          value(str): ユーザーの入力。
+          response(str): ピティナの応答メッセージ。
+          name(str): 応答に使ったResponderの名前。
+          mood(float): 応答を返したときの機嫌値。
+        """
+        # 応答は受け付けた順に届く。処理済みのターンの応答は無視する
+        if turn <= self.answered:
+            return
+        self.answered = turn
+        self.showPending()
+        self.responder_name = name
+        self.mood = mood
+        # ピティナの応答メッセージをラベルに出力
+        self.ui.labelResponce.setText(response)
+        # プロンプト記号にインプット文字列を連結してログ用のリストに出力
+        self.putlog('> ' + value)
+        # ピティナ専用のプロンプト記号に応答メッセージを連結してログ用のリストに出力
+        self.putlog(self.prompt() + response)
         # ピティナのイメージを現在の機嫌値に合わせる
         self.change_looks() # -----------------------------------------------③
+
+    @QtCore.pyqtSlot(int, str, str)
+    def failedSlot(self, turn, value, message):
+        """ DialogueWorkerで対話が失敗したときに呼ばれるイベントハンドラー
+
+        Parameters:
+          turn(int): 入力のターン番号。
+          value(str): ユーザーの入力。
+          message(str): エラーメッセージ。
+        """
+        if turn <= self.answered:
+            return
+        self.answered = turn
+        self.showPending()
+        self.ui.labelResponce.setText('ごめん、うまく答えられなかった… ({})'.format(message))
+        self.putlog('> ' + value)
+
+    def showPending(self):
+        """ 応答を待っている入力があればステータスバーに件数を表示する
+
+        前の応答を待たずに入力できるので、まだ答えていない入力があることを示す。
+        """
+        pending = self.turn - self.answered
+        if pending > 0:
+            self.ui.statusbar.showMessage('考え中… (応答待ち: {}件)'.format(pending))
+        else:
+            self.ui.statusbar.clearMessage()
+
+    def stopWorker(self):
+        """ 受け付けた入力をすべて処理してからDialogueWorkerのスレッドを終了する
+
+        スレッドの終了を待ったあと、まだ届いていない応答のシグナルを処理して
+        ログに反映する。
+        """
+        if not self.workerThread.isRunning():
+            return
+        # stop()はキュー接続なので、先に渡した入力の処理が終わってから呼ばれる
+        self.stopping.emit()
+        self.workerThread.wait()
+        # スレッドから送られたままのresponded/failedシグナルをここで処理する。
+        # スロットをpyqtSlotで宣言しているので、シグナルの宛先はMainWindow自身になる
+        QtCore.QCoreApplication.sendPostedEvents(self, QtCore.QEvent.MetaCall)
             
     def closeEvent(self, event): # -----------------------------------------⑤
         """ウィジェットの閉じるイベントでコールされるイベントハンドラー。
@@ -138,6 +348,9 @@ class MainWindow(QtWidgets.QMainWindow):
           event(QCloseEvent): 閉じるイベント発生時に渡されるQCloseEventオブジェクト。       
 
         """
+        # 対話中のスレッドを止めてから、最後の応答までのログを確実に書き込む
+        self.stopWorker()
+        self.writeLog() # 対話の一部始終をログファイルに保存
         # メッセージボックスを表示
         reply = QtWidgets.QMessageBox.question(
                 self,
@@ -151,7 +364,6 @@ class MainWindow(QtWidgets.QMainWindow):
         # [Yes]クリックでウィジェットを閉じ、[No]クリックで閉じる処理を無効にする。
         if reply == QtWidgets.QMessageBox.Yes:
             self.yukari.save()   # 記憶メソッド実行
-            self.writeLog(     ) # 対話の一部始終をログファイルに保存
             event.accept()       # イベントを続行しcloseする。
         else:           
             event.accept()       # 即座にイベントを続行しcloseする。
@@ -0,0 +1,129 @@
+import mmap
+import os
+import struct
+from array import array
+
+class MappedRandomList(object):
+    """ランダム辞書をメモリマップして1行ずつ取り出すシーケンス
+
+    ランダム辞書ファイルをメモリマップし、空でない行の先頭位置を
+    配列（行オフセットのインデックス）に持つ。len()と添字で要素を取り出せるので、
+    random.choice()にリストのかわりに渡せる。取り出すときはその1行だけをデコードする。
+
+    インデックスはランダム辞書と同じ場所に「ファイル名.idx」として保存し、
+    ランダム辞書の大きさと更新日時が変わっていなければ次回はそれを読み込む。
+
+    Attributes:
+      path (str): ランダム辞書ファイルのパス。
+      index_path (str): 行オフセットのインデックスファイルのパス。
+      offsets (array): 空でない行の先頭のバイト位置。
+    """
+    INDEX_SUFFIX = '.idx'
+    # インデックスファイルの先頭に書く識別子、形式のバージョン、
+    # 元のランダム辞書の大きさと更新日時
+    INDEX_MAGIC = b'YKRIDX'
+    INDEX_VERSION = 1
+    INDEX_HEADER = struct.Struct('<6sHqq')
+
+    def __init__(self, path):
+        """ ランダム辞書をメモリマップし、インデックスを読み込むか作る
+
+        Parameters:
+            path(str): ランダム辞書ファイルのパス。
+        """
+        self.path = path
+        self.index_path = path + MappedRandomList.INDEX_SUFFIX
+        self.file = open(path, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.stamp = (stat.st_size, stat.st_mtime_ns)
+        # 空のファイルはメモリマップできない
+        self.map = b''
+        if stat.st_size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.offsets = self.loadIndex()
+        if self.offsets is None:
+            self.offsets = self.makeIndex()
+            self.saveIndex()
+
+    def makeIndex(self):
+        """ ランダム辞書を1回なぞって空でない行の先頭位置を集める
+
+        Returns:
+            array: 空でない行の先頭のバイト位置。
+        """
+        offsets = array('q')
+        start = 0
+        size = len(self.map)
+        while start < size:
+            end = self.map.find(b'\n', start)
+            if end < 0:
+                end = size
+            # 改行だけの行は読み飛ばす（makeRandomList()と同じ）
+            if self.map[start:end] not in (b'', b'\r'):
+                offsets.append(start)
+            start = end + 1
+        return offsets
+
+    def loadIndex(self):
+        """ 保存されたインデックスを読み込む
+
+        Returns:
+            array: 空でない行の先頭のバイト位置。
+                   インデックスがない、または古い場合はNone。
+        """
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = f.read(MappedRandomList.INDEX_HEADER.size)
+                if header != MappedRandomList.INDEX_HEADER.pack(
+                        MappedRandomList.INDEX_MAGIC,
+                        MappedRandomList.INDEX_VERSION, *self.stamp):
+                    return None
+                offsets = array('q')
+                offsets.frombytes(f.read())
+        except (OSError, ValueError):
+            return None
+        return offsets
+
+    def saveIndex(self):
+        """ インデックスをファイルに保存する
+
+        書き込めない場所にある場合は保存せず、次回もインデックスを作り直す。
+        """
+        tmp = self.index_path + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(MappedRandomList.INDEX_HEADER.pack(
+                    MappedRandomList.INDEX_MAGIC,
+                    MappedRandomList.INDEX_VERSION, *self.stamp))
+                self.offsets.tofile(f)
+            os.replace(tmp, self.index_path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        """ 空でない行の数を返す """
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        """ i番目の行をデコードして返す
+
+        Parameters:
+            i(int): 行の番号（空の行は数えない）。
+
+        Returns:
+            str: 末尾の改行を取り除いた1行。
+        """
+        start = self.offsets[i]
+        end = self.map.find(b'\n', start)
+        if end < 0:
+            end = len(self.map)
+        line = self.map[start:end]
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        return line.decode('utf_8')
+
+    def close(self):
+        """ メモリマップとファイルを閉じる """
+        if self.map:
+            self.map.close()
+        self.file.close()
@@ -0,0 +1,314 @@
+import re
+
+class LiteralAutomaton(object):
+    """キーワードの集合をAho-Corasick法で照合するクラス
+
+    すべてのキーワードから作ったトライ木に失敗遷移を張ったオートマトンで、
+    入力を先頭から1回なぞるだけで、入力に含まれるすべてのキーワードを見つける。
+
+    Attributes:
+      goto (dicのlist): 状態ごとの{文字: 次の状態}。状態0が根。
+      fail (intのlist): 状態ごとの失敗遷移先。
+      output (tupleのlist): 状態ごとに、そこで見つかるキーワードの値。
+    """
+    def __init__(self, keywords):
+        """ キーワードからオートマトンを作る
+
+        Parameters:
+            keywords(tupleのiterable): (キーワード, 値)のペア。
+                                       キーワードが見つかったときに値を返す。
+        """
+        self.goto = [{}]
+        output = [[]]
+        # キーワードのトライ木を作る
+        for keyword, value in keywords:
+            state = 0
+            for ch in keyword:
+                next = self.goto[state].get(ch)
+                if next is None:
+                    next = len(self.goto)
+                    self.goto[state][ch] = next
+                    self.goto.append({})
+                    output.append([])
+                state = next
+            output[state].append(value)
+        # 幅優先で失敗遷移を張り、失敗遷移先の出力を引き継ぐ
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, next in self.goto[state].items():
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[next] = self.goto[f].get(ch, 0)
+                output[next] += output[self.fail[next]]
+                queue.append(next)
+        self.output = [tuple(values) for values in output]
+
+    def search(self, text):
+        """ textに含まれるキーワードの値を集める
+
+        Parameters:
+            text(str): 照合する文字列。
+
+        Returns:
+            set: 見つかったキーワードの値の集合。
+        """
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+class PatternMatcher(object):
+    """パターン辞書全体を1回の走査でマッチングするクラス
+
+    キーワードだけのパターン(PatternItem.literalsがNoneでないもの)は
+    LiteralAutomatonで入力を1回なぞって一度に照合する。
+
+    それ以外のパターンは先読み付きの選択(alternation)に束ねて1本の正規表現に
+    コンパイルする。各パターンは
+      (?=(?s:.*?)(?:パターン))(?P<_p行番号>)
+    という形で、入力の先頭から順に最初にマッチする位置を探す先読みと、
+    どのパターンが成功したかを示す空の名前付きグループになる。
+    選択肢はファイルの並び順に試されるので、1回のmatch()で
+    「束ねたパターンのうちファイルの並び順で最初にマッチしたPatternItem」
+    が分かる。
+
+    2つの結果をインデックス順に突き合わせることで、
+    PatternItem.match()を順に呼ぶ場合と同じ並びでマッチしたPatternItemを返す。
+
+    後方参照を含むパターン、名前付きグループが衝突するパターン、
+    グローバルなインラインフラグを持つパターンは束ねられないため、
+    そのパターン単独のセグメントとしてPatternItem.match()で照合する。
+
+    Attributes:
+      items (PatternItemのlist): 照合対象のPatternItem（パターン辞書の並び順）。
+      automaton (LiteralAutomaton): キーワードだけのパターンを照合するオートマトン。
+      segments (tupleのlist):
+        (PatternItemのインデックスのlist, 束ねた正規表現またはNone)
+        Noneのセグメントは束ねられないパターン1個を表す。
+    """
+    # 1本の正規表現に束ねるパターンの最大数。
+    # グループが多すぎると分岐ごとのグループ状態の退避が重くなるため区切る。
+    CHUNK_SIZE = 200
+    # 束ねた正規表現の名前付きグループの接頭辞
+    GROUP_PREFIX = '_p'
+    # 後方参照、条件付き参照を検出する正規表現
+    BACKREF = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+    def __init__(self, items, chunk_size=CHUNK_SIZE, automaton=None):
+        """ PatternItemのリストからオートマトンと照合用のセグメントを作る
+
+        Parameters:
+            items(PatternItemのlist): Dictionaryのpattern。
+            chunk_size(int): 1本の正規表現に束ねるパターンの最大数。
+            automaton(LiteralAutomaton): 同じitemsから作ったオートマトン。
+                辞書のスナップショットから読み込んだものを使い回すときに渡す。
+        """
+        self.items = items
+        if automaton is None:
+            automaton = LiteralAutomaton(
+                (keyword, index)
+                for index, item in enumerate(items) if item.literals
+                for keyword in item.literals)
+        self.automaton = automaton
+        self.segments = []
+        chunk = []
+        names = set()
+        for index, item in enumerate(items):
+            if item.literals:
+                continue
+            if not self.fusible(item, names):
+                # 束ねられないパターンの手前までを1本にまとめ、
+                # 束ねられないパターンは単独のセグメントにする
+                if chunk:
+                    self.segments.append(self.fuse(chunk))
+                self.segments.append(([index], None))
+                chunk = []
+                names = set()
+                continue
+            # 束ねたパターンが多くなりすぎたら区切る
+            if len(chunk) == chunk_size:
+                self.segments.append(self.fuse(chunk))
+                chunk = []
+                names = set()
+            chunk.append(index)
+            names.update(item.regex.groupindex)
+        if chunk:
+            self.segments.append(self.fuse(chunk))
+
+    def fusible(self, item, names):
+        """ PatternItemの正規表現が束ねられるかを判定する
+
+        Parameters:
+            item(PatternItem): 判定するPatternItem。
+            names(set): 同じセグメントで使われている名前付きグループ名。
+
+        Returns:
+            bool: 束ねられればTrue。
+        """
+        # (?i)などのフラグはパターン全体にかかるため束ねられない
+        if item.regex.flags & ~re.UNICODE:
+            return False
+        # グループ番号がずれると後方参照の意味が変わる
+        if PatternMatcher.BACKREF.search(item.pattern):
+            return False
+        for name in item.regex.groupindex:
+            if name in names or name.startswith(PatternMatcher.GROUP_PREFIX):
+                return False
+        return True
+
+    def fuse(self, indexes):
+        """ インデックスで指定したPatternItemの正規表現を1本に束ねてセグメントを作る
+
+        Parameters:
+            indexes(intのlist): PatternItemのインデックス（昇順）。
+
+        Returns:
+            tuple: (indexes, 束ねた正規表現)
+        """
+        alternatives = []
+        for index in indexes:
+            # 先読みの中に名前付きグループを置くとreの高速な走査が効かなくなるため、
+            # 目印のグループは先読みの後ろに空で置く
+            alternatives.append('(?=(?s:.*?)(?:{}))(?P<{}{}>)'.format(
+                self.items[index].pattern, PatternMatcher.GROUP_PREFIX, index))
+        return (indexes, re.compile('(?:' + '|'.join(alternatives) + ')'))
+
+    def finditer(self, input):
+        """ 入力にマッチするPatternItemをパターン辞書の並び順に返すジェネレーター
+
+        Parameters:
+            input(str): ユーザーが入力したメッセージ。
+
+        Yields:
+            tuple: (PatternItemのインデックス, マッチした文字列)
+        """
+        # キーワードだけのパターンは1回の走査でマッチしたものがすべて分かる
+        literals = sorted(self.automaton.search(input))
+        i = 0
+        for indexes, regex in self.segments:
+            # 正規表現のパターンより前にあるキーワードのパターンを先に返す
+            while i < len(literals) and literals[i] < indexes[0]:
+                yield literals[i], self.items[literals[i]].match(input).group()
+                i += 1
+            for index, matched in self.search_segment(indexes, regex, input):
+                while i < len(literals) and literals[i] < index:
+                    yield literals[i], self.items[literals[i]].match(input).group()
+                    i += 1
+                yield index, matched
+        for index in literals[i:]:
+            yield index, self.items[index].match(input).group()
+
+    def search_segment(self, indexes, regex, input):
+        """ セグメントのパターンのうち入力にマッチするものを並び順に返すジェネレーター
+
+        Parameters:
+            indexes(intのlist): セグメントのPatternItemのインデックス。
+            regex(re.Pattern): 束ねた正規表現。束ねられないパターンはNone。
+            input(str): ユーザーが入力したメッセージ。
+
+        Yields:
+            tuple: (PatternItemのインデックス, マッチした文字列)
+        """
+        if regex is None:
+            m = self.items[indexes[0]].match(input)
+            if m:
+                yield indexes[0], m.group()
+            return
+        m = regex.match(input)
+        if not m:
+            return
+        # 最後に閉じたグループが、最初にマッチしたパターンの目印のグループ。
+        # マッチした文字列はそのPatternItemで取り直す。
+        index = int(m.lastgroup[len(PatternMatcher.GROUP_PREFIX):])
+        yield index, self.items[index].match(input).group()
+        # 2番目以降のマッチが必要になることはまれなので、
+        # セグメントの残りはPatternItem.match()で1個ずつ調べる
+        for index in indexes[indexes.index(index) + 1:]:
+            m = self.items[index].match(input)
+            if m:
+                yield index, m.group()
+
+    def match(self, input):
+        """ 入力に最初にマッチするPatternItemを探す
+
+        Parameters:
+            input(str): ユーザーが入力したメッセージ。
+
+        Returns:
+            tuple: (PatternItemのインデックス, マッチした文字列)、
+                   マッチしない場合はNoneを返す。
+        """
+        return next(self.finditer(input), None)
+
+    def context(self, input):
+        """ 1ターンぶんのMatchContextを作る
+
+        Parameters:
+            input(str): ユーザーが入力したメッセージ。
+
+        Returns:
+            MatchContext: inputに対する照合結果を保持するオブジェクト。
+        """
+        return MatchContext(self, input)
+
+class MatchContext(object):
+    """1ターンぶんのパターン照合の結果を保持するクラス
+
+    yukari.dialogue()がターンごとに1個作り、EmotionとResponderに渡す。
+    照合はPatternMatcher.finditer()で必要になったぶんだけ行い、
+    結果を記録しておくので、同じ入力に対する正規表現の照合は1ターンに1回で済む。
+
+    Attributes:
+      input (str): ユーザーが入力したメッセージ。
+      matches (tupleのlist): これまでに見つかった(インデックス, マッチした文字列)。
+      chosen (int): PatternResponderが応答に使ったPatternItemのインデックス。
+                    パターン辞書の応答を使わなかった場合はNone。
+    """
+    def __init__(self, matcher, input):
+        """ 照合前の状態で初期化する
+
+        Parameters:
+            matcher(PatternMatcher): 照合に使うPatternMatcher。
+            input(str): ユーザーが入力したメッセージ。
+        """
+        self.input = input
+        self.matches = []
+        self.chosen = None
+        self._pending = matcher.finditer(input)
+
+    def __iter__(self):
+        """ マッチしたPatternItemをパターン辞書の並び順に返す
+
+        記録済みの結果を先に返し、足りなければ続きを照合する。
+
+        Yields:
+            tuple: (PatternItemのインデックス, マッチした文字列)
+        """
+        i = 0
+        while True:
+            if i == len(self.matches):
+                m = next(self._pending, None)
+                if m is None:
+                    return
+                self.matches.append(m)
+            yield self.matches[i]
+            i += 1
+
+    def first(self):
+        """ 最初にマッチしたPatternItemの照合結果を返す
+
+        Returns:
+            tuple: (PatternItemのインデックス, マッチした文字列)、
+                   マッチしない場合はNoneを返す。
+        """
+        return next(iter(self), None)
@@ -1,18 +1,36 @@
 import re
 import random
+import sys
+from array import array
 
 class PatternItem:
     """パターン辞書1行の情報を保持するクラス
     
+    学習した辞書では応答フレーズが数十万個になるため、インスタンスは__slots__で
+    __dict__を持たず、応答フレーズは必要機嫌値の配列needsと応答フレーズの
+    リストtextsに分けて保持する。同じ応答フレーズの文字列は共有(intern)する。
+
     Attributes: すべて「パターン辞書1行」あたりのデータ。
       modify (int): 機嫌変動値。
       pattern (str): 正規表現パターン。
+      regex (re.Pattern): patternをコンパイルした正規表現オブジェクト。
+          キーワードだけのパターンは初めて使うときにコンパイルする。
+      literals (strのtuple):
+          patternがメタ文字を含まないキーワード（または'|'で区切ったキーワードの並び）
+          であればそのキーワード。正規表現として照合が必要な場合はNone。
+      needs (array): 応答フレーズごとの必要機嫌値。
+      texts (strのlist): 応答フレーズ。needsと同じ並び。
       phrases(dicのlist):
-          リスト要素の辞書は"応答フレーズ1個"の情報を持つ。
+          needsとtextsから作る"応答フレーズ1個"の情報の辞書のリスト。
           {'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}
           これを1行の応答フレーズグループの数だけ持つ。
+      choices (dic):
+          {機嫌値: 必要機嫌値をクリアした応答フレーズのtuple}
+          choice()が機嫌値ごとに1度だけ作る表。応答フレーズを変更したらNoneにする。
     """
     SEPARATOR = '^((-?\d+)##)?(.*)$'
+    __slots__ = ('modify', 'pattern', '_regex', 'literals',
+                 'needs', 'texts', 'choices')
 
     def __init__(self, pattern, phrases):
         """PatternItemの初期化メソッド
@@ -24,15 +42,17 @@ class PatternItem:
         """        
         # self.modify、self.patternの初期化。
         self.initModifyAndPattern(pattern)
-        # self.phrasesの初期化。
+        # self.needs、self.textsの初期化。
         self.initPhrases(phrases)
 
     def initModifyAndPattern(self, pattern):
-        """self.modify(int)、self.pattern(str)の初期化を行う。
+        """self.modify(int)、self.pattern(str)、self.regex、self.literalsの初期化を行う。
         
         パターン辞書の正規表現パターンの部分にSEPARATORをパターンマッチさせる。
         マッチ結果のリストから機嫌変動値と正規表現パターンを取り出し、
         self.modifyとself.patternに代入する。
+        正規表現パターンはここで1度だけコンパイルしてself.regexに保持する。
+        あわせてキーワードだけのパターンかどうかを調べてself.literalsに保持する。
         
         Parameters:
             pattern(str): パターン辞書1行の正規表現パターン。
@@ -48,39 +68,100 @@ class PatternItem:
           self.modify =int(m[0][1])
         # マッチ結果からパターン部分を取り出してself.patternに代入。
         self.pattern = m[0][2]
+        # キーワードだけのパターンはAho-Corasick法でまとめて照合できる。
+        self.literals = PatternItem.split_literals(self.pattern)
+        # 対話のたびにreモジュールのキャッシュを引かないよう、
+        # パターンをコンパイルしてself.regexに保持する。
+        # キーワードだけのパターンは照合にregexを使わないので後回しにする。
+        self._regex = None
+        if self.literals is None:
+            self._regex = re.compile(self.pattern)
+
+    def __getstate__(self):
+        """pickle用に、パターン辞書1行を復元するのに必要なデータを返す。
+
+        コンパイル済みの正規表現と機嫌値ごとの表は保存せず、復元時に作り直す。
+        """
+        return (self.modify, self.pattern, self.literals, self.needs, self.texts)
+
+    def __setstate__(self, state):
+        """__getstate__()が返したデータからPatternItemを復元する。"""
+        self.modify, self.pattern, self.literals, self.needs, self.texts = state
+        self._regex = None
+        if self.literals is None:
+            self._regex = re.compile(self.pattern)
+        self.choices = None
+
+    @property
+    def regex(self):
+        """patternをコンパイルした正規表現オブジェクト。
+
+        キーワードだけのパターンは初めて参照されたときにコンパイルする。
+        """
+        if self._regex is None:
+            self._regex = re.compile(self.pattern)
+        return self._regex
+
+    @staticmethod
+    def split_literals(pattern):
+        """パターンがキーワードの並びであればキーワードに分解する。
+
+        '大学'や'バイバイ|ばいばい'のように、'|'で区切った各部分が
+        正規表現のメタ文字を含まない空でない文字列であればキーワードとみなす。
+
+        Parameters:
+            pattern(str): パターン辞書1行の正規表現パターン。
+
+        Returns:
+            strのtuple: キーワードのタプル。キーワードの並びでなければNone。
+        """
+        keywords = tuple(pattern.split('|'))
+        for keyword in keywords:
+            # re.escape()で変化しない文字列はメタ文字を含まない
+            if not keyword or re.escape(keyword) != keyword:
+                return None
+        return keywords
         
     def initPhrases(self, phrases):
-        """self.phrases(dicのlist)の初期化を行う。
+        """self.needs(array)、self.texts(strのlist)の初期化を行う。
         
         パターン辞書の応答フレーズグループにSEPARATORをパターンマッチさせる。
         マッチ結果のリストから"応答フレーズ1個"の必要機嫌値と応答フレーズを取り出して
-          {'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}
-        の辞書を作成。これを応答フレーズグループの数だけ繰り返す。
-        
-        作成した辞書はリストself.phrasesの要素にする。
+        必要機嫌値をself.needsに、応答フレーズをself.textsに追加する。
+        これを応答フレーズグループの数だけ繰り返す。
         
         Parameters:
             phrases(str）: パターン辞書1行の応答フレーズグループ。
         """
-        # リスト型のインスタンス変数を用意
-        self.phrases = []
-        # dic型のローカル変数
-        dic = {}
+        # 必要機嫌値の配列と応答フレーズのリストを用意
+        self.needs = array('i')
+        self.texts = []
+        # 機嫌値ごとの応答フレーズの表は必要になるまで作らない
+        self.choices = None
         # 引数で渡された応答フレーズグループを'|'で分割し、
         # 1個の応答フレーズに対してSEPARATORをパターンマッチさせる。
-        # {'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}を作成し、
-        # リストself.phrasesに格納する。
         for phrase in phrases.split('|'):
             # 1個の応答フレーズに対してパターンマッチを行う
             m = re.findall(PatternItem.SEPARATOR, phrase)
-            # 'need'キーの値を必要機嫌値m[0][1]にする
-            # 'phrase'キーの値を応答フレーズm[0][2]にする
-            dic['need'] = 0
+            # 必要機嫌値m[0][1]をself.needsに追加する
+            # 応答フレーズm[0][2]をself.textsに追加する
+            need = 0
             if m[0][1]:
-                dic['need'] = int(m[0][1])
-            dic['phrase'] = m[0][2]
-            # 作成した辞書をリストphrasesに追加
-            self.phrases.append(dic.copy())
+                need = int(m[0][1])
+            self.needs.append(need)
+            # 同じ応答フレーズは1個の文字列オブジェクトを共有する
+            self.texts.append(sys.intern(m[0][2]))
+
+    @property
+    def phrases(self):
+        """応答フレーズの情報を辞書のリストにして返す。
+
+        Returns:
+            dicのlist: [{'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}, ...]
+                       呼び出すたびに作るので、変更してもPatternItemには反映されない。
+        """
+        return [{'need': need, 'phrase': text}
+                for need, text in zip(self.needs, self.texts)]
 
     def match(self, str):
         """ユーザーのメッセージにself.pattern(パターン辞書1行の正規表現パターン)
@@ -93,7 +174,7 @@ class PatternItem:
             Matchオブジェクト、マッチしない場合はNoneを返す。
 
         """
-        return re.search(self.pattern, str)
+        return self.regex.search(str)
 
     def choice(self, mood):
         """現在の機嫌値と必要機嫌値を比較し、適切な応答フレーズを返す
@@ -108,19 +189,38 @@ class PatternItem:
                 クリアする応答フレーズがない場合はNone。
                      
         """
+        # 機嫌値の取り得る値は限られているので、
+        # 機嫌値ごとに応答フレーズの候補を1度だけ作って表に保持する
+        if self.choices is None:
+            self.choices = {}
+        choices = self.choices.get(mood)
+        if choices is None:
+            choices = self.make_choices(mood)
+            self.choices[mood] = choices
+        # 候補が空であればNoneを返す
+        if not choices:
+            return None
+        # 候補からランダムに応答フレーズを抽出して返す
+        return random.choice(choices)
+
+    def make_choices(self, mood):
+        """現在の機嫌値で選べる応答フレーズの候補を作る
+
+        Parameters:
+            mood(int）: ピティナの現在の機嫌値。
+
+        Returns:
+            strのtuple: 必要機嫌値をクリアした応答フレーズ。
+        """
         choices = []
-        # self.phrasesが保持する'need''phrase'の辞書を反復処理する
-        for p in self.phrases:
-            # self.phrasesの'need'キーの数値とパラメーターmoodをsuitable()に渡す
+        # 必要機嫌値と応答フレーズの組を反復処理する
+        for need, text in zip(self.needs, self.texts):
+            # 必要機嫌値とパラメーターmoodをsuitable()に渡す
             # 必要機嫌値による条件をクリア（戻り値がTrue）であれば、
             # 対になっている応答フレーズをchoicesリストに追加する
-            if (self.suitable(p['need'], mood)):
-                choices.append(p['phrase'])
-        # choicesリストが空であればNoneを返す
-        if (len(choices) == 0):
-            return None
-        # choicesリストからランダムに応答フレーズを抽出して返す
-        return random.choice(choices)
+            if (self.suitable(need, mood)):
+                choices.append(text)
+        return tuple(choices)
 
     def suitable(self, need, mood):
         """現在の機嫌値が必要機嫌値の条件を満たすかを判定
@@ -154,20 +254,15 @@ class PatternItem:
             phrase(str): ユーザーのメッセージ
             
         """
-        # 既存の応答フレーズにユーザーのメッセージが一致するかを順次調べ、
-        # 一致するフレーズがあった時点でreturnしてメソッドを終了。
-        #
-        # self.phrases(dicのlist):
-        #　　　　リスト要素の辞書は"応答フレーズ1個"の情報を持つ。
-        #     [{'need': 必要機嫌値, 'phrase': '応答フレーズ1個'}, ...]
-        # 
-        # Block Parameters:
-        #     p(dic): 必要機嫌値と応答フレーズ1個の情報を持つ。
-        for p in self.phrases: # ---------------------------------------②
-            if p['phrase'] == phrase:
-                return
-        # リストself.phrasesに、{'need':0, 'phrase':'ユーザーのメッセージ'}を追加。
-        self.phrases.append({'need': 0, 'phrase': phrase}) # -----------③
+        # 既存の応答フレーズにユーザーのメッセージが一致するかを調べ、
+        # 一致するフレーズがあればreturnしてメソッドを終了。
+        if phrase in self.texts: # -------------------------------------②
+            return
+        # 必要機嫌値0、応答フレーズ'ユーザーのメッセージ'を追加。
+        self.needs.append(0) # -----------------------------------------③
+        self.texts.append(sys.intern(phrase))
+        # 応答フレーズが増えたので機嫌値ごとの表を作り直させる
+        self.choices = None
         
     def make_line(self): # ---------------------------------------------④
         """パターン辞書1行ぶんのデータを作る
@@ -183,10 +278,11 @@ class PatternItem:
         # 応答フレーズのグループを作成する。
         #
         # Block Parameters:
-        #    p(dic): 必要機嫌値と応答フレーズ1個の情報を持つ。
-        for p in self.phrases:
+        #    need(int): 必要機嫌値。
+        #    text(str): 応答フレーズ1個。
+        for need, text in zip(self.needs, self.texts):
             # '必要機嫌値##応答フレーズ'を作ってリストに追加する。
-            pr_list.append(str(p['need']) + '##' + p['phrase'])
+            pr_list.append(str(need) + '##' + text)
         
         # '機嫌変動値##パターン文字列[TAB]' に|で区切った
         # '必要機嫌値##応答フレーズ' のグループを連結して返す
@@ -17,12 +17,13 @@ class Responder(object):
         """
         self.name = name
 
-    def response(self, input, mood): # ------------パラメーターmoodを追加
+    def response(self, input, mood, context=None): # ---パラメーターmoodを追加
         """ オーバーライドを前提としたresponse()メソッド。
         
         Parameters:
             input(str): ユーザーが入力したメッセージ。
             mood(int): ピティナの機嫌値
+            context(MatchContext): このターンのパターン照合の結果。
         Returns:
             str: 応答メッセージ（ただし空の文字列)。    
     
@@ -41,12 +42,13 @@ class RepeatResponder(Responder):
         """        
         super().__init__(name)
    
-    def response(self, input, mood): # ------------パラメーターmoodを追加
+    def response(self, input, mood, context=None): # ---パラメーターmoodを追加
         """ response()をオーバーライド、オウム返しの返答をする。
 
         Parameters:
             input(str): ユーザーが入力したメッセージ。
             mood(int): ピティナの機嫌値
+            context(MatchContext): このターンのパターン照合の結果。
             
         Returns:
             str: 応答メッセージ。    
@@ -73,12 +75,13 @@ class RandomResponder(Responder):
         super().__init__(name)
         self.random = dic_random
 
-    def response(self, input, mood): # ------------パラメーターmoodを追加
+    def response(self, input, mood, context=None): # ---パラメーターmoodを追加
         """ response()をオーバーライド、ランダムな応答を返す。
 
         Parameters:
             input(str): ユーザーが入力したメッセージ。
             mood(int): ピティナの機嫌値
+            context(MatchContext): このターンのパターン照合の結果。
             
         Returns:
             str: リストからランダムに抽出した応答メッセージ。
@@ -106,31 +109,34 @@ class PatternResponder(Responder):
         super().__init__(name)
         self.dictionary = dictionary
 
-    def response(self, input, mood):
+    def response(self, input, mood, context=None):
         """ パターンにマッチした場合に応答文字列を作って返す。
 
             input(str): ユーザーが入力したメッセージ。
             mood(int): ピティナの機嫌値。
+            context(MatchContext): このターンのパターン照合の結果。
+                省略した場合はここで照合を行う。
 
         Returns:
             str: パターンにマッチした場合はパターンと対になっている応答メッセージを返す。
                  パターンにマッチしない場合はランダム辞書の応答メッセージを返す。
             
         """
-        resp = None # ------------------------------------------①
-        # patternリストのPatternItemオブジェクトに対して反復処理を行う。
-        for ptn_item in self.dictionary.pattern: # -------------②
-            # パターン辞書1行の正規表現がユーザーのメッセージにマッチするか試みる。
-            # マッチしたらMatchオブジェクト、そうでなければNoneが返ってくる。
-            m = ptn_item.match(input) # ------------------------③
+        # このターンの照合結果がなければパターン辞書全体を照合する。
+        if context is None: # ------------------------------------①
+            context = self.dictionary.matcher.context(input)
+        # マッチしたPatternItemを並び順に取り出す。
+        # MatchContextは(インデックス, マッチした文字列)を返す。
+        for index, matched in context: # ---------------------------②③
             # マッチした場合は機嫌値moodを引数にしてchoice()を実行。
             # 現在の機嫌値に見合う応答フレーズを取得する。
-            if m:
-                resp = ptn_item.choice(mood) # -----------------④
+            resp = self.dictionary.pattern[index].choice(mood) # -----④
             # choice()の戻り値がNoneでない場合は
             # 応答例の中の%match%をインプットされた文字列内の
             # マッチした文字列に置き換える
-            if resp != None: # ---------------------------------⑤
-                return re.sub('%match%', m.group(), resp)
+            if resp != None: # ---------------------------------------⑤
+                # 応答に使ったPatternItemをターンの記録に残す
+                context.chosen = index
+                return re.sub('%match%', matched, resp)
         # パターンマッチしない場合はランダム辞書から返す
         return random.choice(self.dictionary.random) # ---------⑥
@@ -1,4 +1,7 @@
+import os
 import random
+import sys
+import time
 import responder
 import dictionary
 
@@ -12,21 +15,36 @@ class yukari(object):
       res_repeat (obj:`RepeatResponder`): RepeatResponderオブジェクトを保持する。      
       res_random (obj:`RandomResponder`): RandomResponderオブジェクトを保持する。      
       res_pattern (obj:`PatternResponder`): PatternResponderオブジェクトを保持する。      
+      session (str): この対話のセッションID。
+      turns (int): これまでの対話の回数。
+      last_turn (dic): 最後の対話の記録。まだ対話していなければNone。
+          {'session': セッションID, 'turn': 何回目の対話か, 'time': UNIX時刻,
+           'input': 入力, 'response': 応答, 'responder': Responderの名前,
+           'matched': 最初にマッチしたPatternItemのインデックス,
+           'pattern': 応答に使ったPatternItemのインデックス,
+           'mood_before': 対話前の機嫌値, 'mood_after': 対話後の機嫌値,
+           'us': {段階ごとの処理時間（マイクロ秒）}}
+          インデックスは該当しなければNone。処理時間の段階は
+          match（パターンの照合）、emotion（機嫌値の更新）、
+          select（Responderの選択）、response（応答フレーズの選択）、
+          total（dialogue()全体）。
+      turn_log (obj:`TurnLog`): 対話の記録を書き込むTurnLog。Noneなら書き込まない。
 
     """
-    def __init__(self, name):
+    def __init__(self, name, turn_log=None):
         """ Pitynaオブジェクトの名前をnameに格納。
             Responderオブジェクトを生成してresponderに格納。
             
             Parameters:
                 name(str): Pitynaオブジェクトの名前。
+                turn_log(TurnLog): 対話の記録を書き込むTurnLog。
         """
         # Pitynaオブジェクトの名前をインスタンス変数に代入。
         self.name = name
         # Dictionaryを生成
         self.dictionary = dictionary.Dictionary()
         # Emotionを生成
-        self.emotion = Emotion(self.dictionary.pattern) # ----------------①
+        self.emotion = Emotion(self.dictionary) # ------------------------①
         # RepeatResponderを生成
         self.res_repeat = responder.RepeatResponder('Repeat?')
         # RandomResponderを生成
@@ -37,6 +55,12 @@ class yukari(object):
         self.res_pattern = responder.PatternResponder(
                 'Pattern', self.dictionary
                 )
+        # 対話の記録
+        # uuidモジュールは読み込みが重いので、同じ長さの乱数の16進数を使う
+        self.session = os.urandom(16).hex()
+        self.turns = 0
+        self.last_turn = None
+        self.turn_log = turn_log
 
     def dialogue(self, input):
         """ 応答オブジェクトのresponse()を呼び出して応答文字列を取得する。
@@ -47,7 +71,14 @@ class yukari(object):
             Returns:
                 str: ピティナの応答フレーズ。
         """
-        self.emotion.update(input) # ------------------------------------②
+        start = time.perf_counter()
+        mood_before = self.emotion.mood
+        # このターンのパターン照合の結果をEmotionとResponderで共有する
+        context = self.dictionary.matcher.context(input)
+        matched = context.first()
+        t_match = time.perf_counter()
+        self.emotion.update(input, context) # ---------------------------②
+        t_emotion = time.perf_counter()
         # 1から100をランダムに生成
         x = random.randint(1, 100)
         # 60以下ならPatternResponderオブジェクトにする
@@ -59,8 +90,34 @@ class yukari(object):
         # それ以外はRepeatResponderオブジェクトにする
         else:
             self.responder = self.res_repeat
-        print(self.emotion.mood) ##### 機嫌値を確認したいときに使う #####
-        return self.responder.response(input, self.emotion.mood) # -----②
+        t_response = time.perf_counter()
+        response = self.responder.response(
+            input, self.emotion.mood, context) # ------------------------②
+        end = time.perf_counter()
+        # 標準出力は応答に使うので、機嫌値は標準エラー出力に出す。
+        # 段階ごとの処理時間に含めないよう、計測を終えてから書き出す
+        print(self.emotion.mood, file = sys.stderr) ##### 機嫌値を確認したいときに使う #####
+        # このターンの記録を残す
+        self.turns += 1
+        self.last_turn = {
+            'session': self.session,
+            'turn': self.turns,
+            'time': time.time(),
+            'input': input,
+            'response': response,
+            'responder': self.responder.name,
+            'matched': matched[0] if matched else None,
+            'pattern': context.chosen,
+            'mood_before': mood_before,
+            'mood_after': self.emotion.mood,
+            'us': {'match': round((t_match - start) * 1e6),
+                   'emotion': round((t_emotion - t_match) * 1e6),
+                   'select': round((t_response - t_emotion) * 1e6),
+                   'response': round((end - t_response) * 1e6),
+                   'total': round((end - start) * 1e6)}}
+        if self.turn_log is not None:
+            self.turn_log.writeTurn(self.last_turn)
+        return response
 
     def get_responder_name(self):
         """ 応答に使用されたオブジェクト名を返す。
@@ -84,7 +141,7 @@ class Emotion:
     """ ピティナの感情モデル
     
     Attributes:
-      pattern (PatternItemのlist): [PatternItem1, PatternItem2, PatternItem3, ...]
+      dictionary (obj:`Dictionary`): パターン辞書とPatternMatcherを保持する。
       mood (int): ピティナの機嫌値を保持する。
       
     """
@@ -93,21 +150,20 @@ class Emotion:
     MOOD_MAX = 15 # ----------------------------------------②
     MOOD_RECOVERY = 0.5 # ----------------------------------③
 
-    def __init__(self, pattern): # -------------------------④
+    def __init__(self, dictionary): # ----------------------④
         """ 初期化メソッド
         
-            ・Dictionaryオブジェクトのpatternをインスタンス変数dictionaryに格納。
+            ・Dictionaryオブジェクトをインスタンス変数dictionaryに格納。
             ・機嫌値moodを0で初期化する。
 
             Parameters:
-                pattern(dec) :Dictionaryのpattern
-                              (中身はPatternItemのリスト)
+                dictionary(Dictionary) :Dictionaryオブジェクト
                 
         """
-        self.pattern = pattern
+        self.dictionary = dictionary
         self.mood = 0
 
-    def update(self, input): # -----------------------------⑤
+    def update(self, input, context=None): # ---------------⑤
         """ 機嫌値を変動させるメソッド
             
             ・機嫌値をプラス/マイナス側にMOOD_RECOVERYのぶんだけ戻す。
@@ -115,6 +171,8 @@ class Emotion:
 
             Parameters:
               input(str) : ユーザーからのメッセージ
+              context(MatchContext) : このターンのパターン照合の結果。
+                                      省略した場合はここで照合を行う。
               
         """
         # 機嫌を徐々にもとに戻す処理。
@@ -123,12 +181,13 @@ class Emotion:
         elif self.mood > 0: # ------------------------------⑦
             self.mood -= Emotion.MOOD_RECOVERY
           
-        # パターン辞書の各行の正規表現をユーザーのメッセージに繰り返しパターンマッチさせる。
-        # マッチした場合はadjust_mood()で機嫌値を変動させる。
-        for ptn_item in self.pattern: # --------------------⑧
-            if ptn_item.match(input): # --------------------⑨
-                self.adjust_mood(ptn_item.modify) # --------⑩
-                break
+        # パターン辞書の正規表現をまとめてユーザーのメッセージにパターンマッチさせる。
+        # 最初にマッチしたPatternItemの機嫌変動値でadjust_mood()を実行する。
+        if context is None:
+            context = self.dictionary.matcher.context(input)
+        m = context.first() # ------------------------------⑧
+        if m: # --------------------------------------------⑨
+            self.adjust_mood(self.dictionary.pattern[m[0]].modify) # ⑩
 
     def adjust_mood(self, val): # --------------------------⑪
         """ 機嫌値を増減させるメソッド
@@ -144,3 +203,8 @@ class Emotion:
             self.mood = Emotion.MOOD_MAX
         elif self.mood < Emotion.MOOD_MIN:
             self.mood = Emotion.MOOD_MIN
+
+if __name__ == "__main__":
+    # python -m yukariで画面なしの対話コマンドを起動する
+    import console
+    sys.exit(console.main())